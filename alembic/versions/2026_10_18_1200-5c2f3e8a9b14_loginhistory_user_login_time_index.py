@@ -0,0 +1,34 @@
+"""loginhistory user_id login_time index
+
+Revision ID: 5c2f3e8a9b14
+Revises: 0611358e1d60
+Create Date: 2026-10-18 12:00:41.208153
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2f3e8a9b14'
+down_revision: Union[str, None] = '0611358e1d60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY does not lock the table for writes, but can't run inside a transaction.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_loginhistory_user_id_login_time',
+            'loginhistory',
+            ['user_id', sa.text('login_time DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_loginhistory_user_id_login_time', table_name='loginhistory', postgresql_concurrently=True)
@@ -9,4 +9,9 @@ export PYTHONPATH=/app/.venv/bin:${PATH}
 
 alembic upgrade head
 
+# Metrics of gunicorn workers are aggregated through files, stale files of the previous run must be removed.
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "${PROMETHEUS_MULTIPROC_DIR}"
+mkdir -p "${PROMETHEUS_MULTIPROC_DIR}"
+
 exec gunicorn --bind 0.0.0.0:8000 src.main:app --worker-class uvicorn.workers.UvicornWorker
\ No newline at end of file
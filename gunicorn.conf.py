@@ -0,0 +1,6 @@
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # Drop live gauges of the exited worker from aggregated metrics.
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from redis.asyncio import RedisCluster
+
+from src.core.metrics import generate_metrics
+from src.db import redis
+
+router = APIRouter()
+
+
+@router.get('/metrics', include_in_schema=False)
+async def metrics():
+    if isinstance(redis.redis, RedisCluster):
+        # Cluster nodes manage connections without a pool class to hook into.
+        stats = redis.pool_stats(redis.redis)
+        redis.record_pool_usage(stats['in_use'], stats['idle'])
+    return Response(generate_metrics(), media_type=CONTENT_TYPE_LATEST)
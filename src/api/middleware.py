@@ -0,0 +1,95 @@
+import time
+
+from opentelemetry import propagate
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core import tracing
+from src.core.metrics import (
+    REQUEST_DB_CHECKOUTS,
+    REQUEST_DB_QUERIES,
+    REQUEST_DURATION,
+    REQUESTS_IN_PROGRESS,
+    RequestStats,
+    request_stats
+)
+
+
+class MetricsMiddleware:
+    """
+    Record duration, in-flight count, SQL statements and pool checkouts count of HTTP requests, labelled by route template.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method, route = scope['method'], get_route_template(scope)
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        stats = RequestStats()
+        stats_token = request_stats.set(stats)
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_DURATION.labels(method, route, status_code).observe(time.perf_counter() - started_at)
+            REQUEST_DB_QUERIES.labels(route).observe(stats.queries)
+            REQUEST_DB_CHECKOUTS.labels(route, status_code).observe(stats.checkouts)
+            request_stats.reset(stats_token)
+            in_progress.dec()
+
+
+class TracingMiddleware:
+    """Wrap HTTP requests into server spans, continuing W3C trace context from request headers."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or tracing.tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        method, route = scope['method'], get_route_template(scope)
+        parent = propagate.extract({name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']})
+
+        with tracing.tracer.start_as_current_span(
+            f'{method} {route}',
+            context=parent,
+            kind=SpanKind.SERVER,
+            attributes={'http.method': method, 'http.route': route, 'http.target': scope['path']},
+        ) as request_span:
+            async def send_with_status(message: Message):
+                if message['type'] == 'http.response.start':
+                    request_span.set_attribute('http.status_code', message['status'])
+                    if message['status'] >= 500:
+                        request_span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+
+def get_route_template(scope: Scope) -> str:
+    """Return path template of the matching route: raw paths with IDs would make unbounded label values."""
+    partial = None
+    for route in scope['app'].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or 'unmatched'
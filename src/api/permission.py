@@ -1,11 +1,32 @@
-from async_fastapi_jwt_auth import AuthJWT
 from fastapi import Depends, HTTPException, status
 
+from src.core.auth import AuthContext
+from src.services.authentication import TokenDenylist, get_token_denylist
+from src.services.roles import RoleService, get_role_service
 
-def has_permission(required_access_level: int):
-    async def access_level_checker(Authorize: AuthJWT = Depends()):
+
+def has_permission(required_access_level: int, check_claims_version: bool = True):
+    """
+    Return dependency checking the access token and its access level.
+
+    :param check_claims_version: Reject tokens issued before the user's claims changed. Disabled for refresh,
+        which issues a token with the current claims.
+    """
+    async def access_level_checker(
+        Authorize: AuthContext = Depends(),
+        role_service: RoleService = Depends(get_role_service),
+        denylist: TokenDenylist = Depends(get_token_denylist),
+    ):
         await Authorize.jwt_required()
-        token_access_level = (await Authorize.get_raw_jwt()).get("access_level", 0)
+        raw_jwt = await Authorize.get_raw_jwt()
+
+        if denylist.is_revoked(raw_jwt['jti']):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+
+        if check_claims_version and not role_service.claims_versions.is_current(raw_jwt['sub'], raw_jwt.get('cv', 0)):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token claims are outdated")
+
+        token_access_level = raw_jwt.get("access_level", 0)
 
         if not check_access_level(token_access_level, required_access_level):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
@@ -0,0 +1,33 @@
+from json import JSONDecodeError
+
+from fastapi import Depends, Request
+
+from src.core.config import settings
+from src.services.rate_limit import RateLimiter, get_rate_limiter
+
+
+def rate_limit(route: str):
+    """
+    Return dependency limiting requests to the route by client IP and by `username` field of the JSON body.
+
+    :param route: Route name, key of `RateLimitSettings.routes`.
+    """
+    async def limiter(request: Request, rate_limiter: RateLimiter = Depends(get_rate_limiter)):
+        await rate_limiter.check(route, get_client_ip(request), await get_username(request))
+    return limiter
+
+
+def get_client_ip(request: Request) -> str:
+    if settings.rate_limit.client_ip_header and (client_ip := request.headers.get(settings.rate_limit.client_ip_header)):
+        return client_ip
+    return request.client.host if request.client else 'unknown'
+
+
+async def get_username(request: Request) -> str | None:
+    # Body is already read and parsed by FastAPI before dependencies are solved, Request caches it.
+    try:
+        body = await request.json()
+    except (JSONDecodeError, UnicodeDecodeError):
+        return None
+    username = body.get('username') if isinstance(body, dict) else None
+    return username if isinstance(username, str) else None
@@ -0,0 +1,45 @@
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+JSON_MEDIA_TYPE = 'application/json'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+class PreEncodedResponse:
+    """JSON response with a constant body, encoded once at import instead of on every request."""
+
+    def __init__(self, content: BaseModel, status_code: int = 200):
+        self.body = orjson.dumps(content.model_dump(mode='json'))
+        self.status_code = status_code
+
+    def __call__(self, sub_response: Response | None = None) -> Response:
+        """
+        Return response with the body.
+
+        :param sub_response: Response injected into the handler. FastAPI ignores it when a handler returns
+            a response, so its headers (e.g. cookies set by AuthJWT) are copied.
+        """
+        response = Response(self.body, status_code=self.status_code, media_type=JSON_MEDIA_TYPE)
+        if sub_response is not None:
+            response.headers.raw.extend(sub_response.headers.raw)
+        return response
+
+
+def schema_response(content: BaseModel, status_code: int = 200, exclude_none: bool = False) -> Response:
+    """
+    Return response with JSON serialized by the schema.
+
+    For data built by the response schema: FastAPI would dump it to a dict, validate it again and encode the result.
+    """
+    return Response(content.model_dump_json(exclude_none=exclude_none), status_code=status_code, media_type=JSON_MEDIA_TYPE)
+
+
+def adapter_response(adapter: TypeAdapter, content) -> Response:
+    """Return response with JSON of the content, validated and serialized by the adapter in a single pass each."""
+    return Response(adapter.dump_json(adapter.validate_python(content)), media_type=JSON_MEDIA_TYPE)
+
+
+def ndjson_line(content: BaseModel) -> bytes:
+    """Return the schema serialized as a line of NDJSON report, without empty fields."""
+    return content.model_dump_json(exclude_none=True).encode() + b'\n'
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
-from src.api.v1 import account_router, auth_router, history_router, role_router
+from src.api.metrics import router as metrics_router
+from src.api.v1 import account_router, auth_router, history_router, role_router, users_router
 
 main_router = APIRouter()
 
@@ -16,3 +17,7 @@ main_router.include_router(
 main_router.include_router(
     account_router, prefix='/account', tags=['Account']
 )
+main_router.include_router(
+    users_router, prefix='/users', tags=['Users']
+)
+main_router.include_router(metrics_router)
@@ -2,3 +2,4 @@ from .account import router as account_router
 from .auth import router as auth_router
 from .history import router as history_router
 from .roles import router as role_router
+from .users import router as users_router
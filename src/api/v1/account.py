@@ -1,17 +1,25 @@
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.api.permission import has_permission
+from src.api.responses import PreEncodedResponse
+from src.core.constants import RoleAccess
 from src.core.db import get_async_session
 from src.schemas.responses import DetailResponse
 from src.services.account import AccountService, get_account_service
 from src.services.authentication import AuthenticationService, get_authentication_service
+from src.services.username_filter import UsernameFilter, get_username_filter
 
 router = APIRouter()
 
+USERNAME_CHANGED_RESPONSE = PreEncodedResponse(DetailResponse(detail='Username changed'))
+PASSWORD_CHANGED_RESPONSE = PreEncodedResponse(DetailResponse(detail='Password changed'))
+
 
 @router.post(
     path='/change_username',
     response_model=DetailResponse,
+    dependencies=[Depends(has_permission(RoleAccess.USER))],
     responses={
         status.HTTP_400_BAD_REQUEST: {'model': DetailResponse, 'description': 'Incorrect new username'},
         status.HTTP_404_NOT_FOUND: {'model': DetailResponse, 'description': 'User not found'},
@@ -22,19 +30,22 @@ async def change_username(
     auth: AuthenticationService = Depends(get_authentication_service),
     db_session: AsyncSession = Depends(get_async_session),
     account: AccountService = Depends(get_account_service),
+    username_filter: UsernameFilter = Depends(get_username_filter),
 ):
     await auth.jwt_required()
 
     user_id = await auth.get_jwt_subject()
 
     await account.change_username(db_session, user_id, new_username)
+    await username_filter.add(new_username)
 
-    return {'detail': 'Username changed'}
+    return USERNAME_CHANGED_RESPONSE()
 
 
 @router.post(
     path='/change_password',
     response_model=DetailResponse,
+    dependencies=[Depends(has_permission(RoleAccess.USER))],
     responses={
         status.HTTP_400_BAD_REQUEST: {'model': DetailResponse, 'description': 'Incorrect new password'},
         status.HTTP_404_NOT_FOUND: {'model': DetailResponse, 'description': 'User not found'},
@@ -53,4 +64,4 @@ async def change_password(
 
     await account.change_password(db_session, user_id, old_password, new_password)
 
-    return {'detail': 'Password changed'}
+    return PASSWORD_CHANGED_RESPONSE()
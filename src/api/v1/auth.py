@@ -1,18 +1,25 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.api.permission import has_permission
+from src.api.rate_limit import rate_limit
+from src.api.responses import PreEncodedResponse, schema_response
 from src.core.constants import RoleAccess
 from src.core.db import get_async_session
 from src.schemas.responses import DetailResponse
-from src.schemas.user import UserCreateOrUpdate, UserDB, UserLogin
+from src.schemas.user import UserCreateOrUpdate, UserDB, UserLogin, UsernameAvailability
 from src.services.authentication import AuthenticationService, get_authentication_service
 from src.services.history import HistoryService, get_history_service
 from src.services.roles import RoleService, get_role_service
+from src.services.username_filter import UsernameFilter, get_username_filter
 from src.services.users import UserService, get_user_service
 
 router = APIRouter()
 
+LOGIN_RESPONSE = PreEncodedResponse(DetailResponse(detail='Successfully login'))
+REFRESH_RESPONSE = PreEncodedResponse(DetailResponse(detail='Token has been refreshed'))
+LOGOUT_RESPONSE = PreEncodedResponse(DetailResponse(detail='Successfully log out'))
+
 
 @router.post(
     '/register',
@@ -21,16 +28,18 @@ router = APIRouter()
     responses={
         status.HTTP_409_CONFLICT: {'model': DetailResponse, 'description': 'Username already registered'},
         status.HTTP_403_FORBIDDEN: {'model': DetailResponse, 'description': 'Password is too weak'},
+        status.HTTP_429_TOO_MANY_REQUESTS: {'model': DetailResponse, 'description': 'Too many requests'},
     },
+    dependencies=[Depends(rate_limit('register'))],
 )
 async def register(
     user: UserCreateOrUpdate,
     user_service: UserService = Depends(get_user_service),
-    role_service: RoleService = Depends(get_role_service),
+    username_filter: UsernameFilter = Depends(get_username_filter),
     session: AsyncSession = Depends(get_async_session),
 ):
-    default_role = await role_service.get_default_role(session)
-    user = await user_service.create(user.username, user.password, session, default_role)
+    user = await user_service.create(user.username, user.password, session)
+    await username_filter.add(user.username)
 
     return user
 
@@ -41,46 +50,77 @@ async def register(
     responses={
         status.HTTP_401_UNAUTHORIZED: {'model': DetailResponse, 'description': 'Wrong password'},
         status.HTTP_404_NOT_FOUND: {'model': DetailResponse, 'description': 'Username is not registered'},
+        status.HTTP_429_TOO_MANY_REQUESTS: {'model': DetailResponse, 'description': 'Too many requests'},
     },
+    dependencies=[Depends(rate_limit('login'))],
 )
 async def login(
     user: UserLogin,
+    response: Response,
     auth_service: AuthenticationService = Depends(get_authentication_service),
     history_service: HistoryService = Depends(get_history_service),
+    role_service: RoleService = Depends(get_role_service),
     user_service: UserService = Depends(get_user_service),
+    username_filter: UsernameFilter = Depends(get_username_filter),
     session: AsyncSession = Depends(get_async_session),
 ):
+    if not await username_filter.might_contain(user.username):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Username is not registered')
+
     user = await user_service.verify(user.username, user.password, session)
     await history_service.create(session, user.id)
 
-    role = await user.awaitable_attrs.role
+    await auth_service.new_token_pair(subject=str(user.id), claims=await role_service.get_token_claims(user))
 
-    await auth_service.new_token_pair(subject=str(user.id), claims={'access_level': role.access_level})
+    return LOGIN_RESPONSE(response)
+
+
+@router.get(
+    '/username_available',
+    response_model=UsernameAvailability,
+    responses={status.HTTP_429_TOO_MANY_REQUESTS: {'model': DetailResponse, 'description': 'Too many requests'}},
+    dependencies=[Depends(rate_limit('username_available'))],
+)
+async def username_available(
+    username: str,
+    user_service: UserService = Depends(get_user_service),
+    username_filter: UsernameFilter = Depends(get_username_filter),
+    session: AsyncSession = Depends(get_async_session),
+):
+    # The database is queried only if the filter can't rule the username out.
+    available = (
+        not await username_filter.might_contain(username) or not await user_service.get_by_name(session, username)
+    )
 
-    return {'detail': 'Successfully login'}
+    return schema_response(UsernameAvailability(username=username, available=available))
 
 
-@router.post('/refresh', response_model=DetailResponse, dependencies=[Depends(has_permission(RoleAccess.USER))])
+@router.post(
+    '/refresh',
+    response_model=DetailResponse,
+    dependencies=[Depends(has_permission(RoleAccess.USER, check_claims_version=False))],
+)
 async def refresh(
+        response: Response,
         auth_service: AuthenticationService = Depends(get_authentication_service),
+        role_service: RoleService = Depends(get_role_service),
         user_service: UserService = Depends(get_user_service),
         session: AsyncSession = Depends(get_async_session)
 ):
-    await auth_service.jwt_refresh_token_required()
+    await auth_service.jwt_refresh_token_required(check_used=False)
 
     subject = await auth_service.get_jwt_subject()
-    user = await user_service.get(session, subject)
-    role = await user.awaitable_attrs.role
+    user = await user_service.get(session, subject, load_role=True)
 
-    await auth_service.new_token_pair(subject=subject, claims={'access_level': role.access_level})
+    await auth_service.refresh_token_pair(claims=await role_service.get_token_claims(user))
 
-    return {'detail': 'Token has been refreshed'}
+    return REFRESH_RESPONSE(response)
 
 
 @router.post('/logout', response_model=DetailResponse)
-async def logout(auth_service: AuthenticationService = Depends(get_authentication_service)):
+async def logout(response: Response, auth_service: AuthenticationService = Depends(get_authentication_service)):
     await auth_service.jwt_refresh_token_required()
 
     await auth_service.logout()
 
-    return {'detail': 'Successfully log out'}
+    return LOGOUT_RESPONSE(response)
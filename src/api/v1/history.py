@@ -1,39 +1,58 @@
 from typing import Annotated
 
-from async_fastapi_jwt_auth import AuthJWT
 from fastapi import APIRouter, Depends
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.api.permission import has_permission
+from src.api.responses import schema_response
+from src.core.auth import AuthContext
+from src.core.config import settings
 from src.core.constants import RoleAccess
 from src.core.db import get_async_session
+from src.db.redis import get_redis
 from src.schemas.history import HistorySchema
-from src.schemas.requests import PageParams
-from src.schemas.responses import PagedResponseSchema
+from src.schemas.requests import CursorParams, PageParams
+from src.schemas.responses import CursorPagedResponseSchema, PagedResponseSchema
 from src.services.history import HistoryService, get_history_service
+from src.utils.paginate import CachedCount
 
 router = APIRouter()
 
 
 @router.get(
     '/',
-    response_model=PagedResponseSchema[HistorySchema],
+    response_model=PagedResponseSchema[HistorySchema] | CursorPagedResponseSchema[HistorySchema],
     dependencies=[Depends(has_permission(RoleAccess.USER))],
     response_model_exclude_none=True,
 )
 async def get_user_history(
         page_params: Annotated[PageParams, Depends()],
-        Authorize: AuthJWT = Depends(),
+        cursor_params: Annotated[CursorParams, Depends()],
+        Authorize: AuthContext = Depends(),
         history_service: HistoryService = Depends(get_history_service),
-        session: AsyncSession = Depends(get_async_session)):
+        session: AsyncSession = Depends(get_async_session),
+        redis: Redis = Depends(get_redis)):
     await Authorize.jwt_required()
 
     user_id = await Authorize.get_jwt_subject()
 
-    data, pages_count = await history_service.get_history_paginated(session, user_id, page_params)
+    if cursor_params.cursor is not None:
+        data, next_cursor = await history_service.get_history_by_cursor(
+            session, user_id, cursor_params.cursor, page_params.size
+        )
+        return schema_response(CursorPagedResponseSchema[HistorySchema](
+            size=page_params.size,
+            next=next_cursor,
+            items=[HistorySchema.model_validate(item) for item in data],
+        ), exclude_none=True)
 
-    return PagedResponseSchema(
+    counter = CachedCount(redis, settings.pagination.count_cache_ttl, scope=user_id)
+    data, pages_count, estimated = await history_service.get_history_paginated(session, user_id, page_params, counter)
+
+    return schema_response(PagedResponseSchema[HistorySchema](
         last=pages_count,
-        items=[HistorySchema.from_orm(item) for item in data],
+        last_is_estimate=estimated,
+        items=[HistorySchema.model_validate(item) for item in data],
         **page_params.model_dump(),
-    )
+    ), exclude_none=True)
@@ -1,18 +1,25 @@
+from typing import AsyncIterator
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.api.permission import has_permission
+from src.api.responses import NDJSON_MEDIA_TYPE, adapter_response, ndjson_line, schema_response
 from src.core.constants import RoleAccess
 from src.core.db import get_async_session
-from src.schemas.roles import RoleCRUD, RoleDB
+from src.models import Role
+from src.schemas.roles import BulkRoleAssign, BulkRoleResult, BulkRoleSummary, BulkRoleTarget, RoleCRUD, RoleDB
 from src.schemas.user import UserWithRole
 from src.services.roles import RoleService, get_role_service
 from src.services.users import UserService, get_user_service
 
 router = APIRouter()
 
+ROLES_ADAPTER = TypeAdapter(list[RoleDB])
+
 
 @router.post(
     '/create', response_model=RoleDB, status_code=status.HTTP_201_CREATED,
@@ -24,7 +31,9 @@ async def create_role(
     if await role_service.get_by_name(session, role_data.name):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Role already exists")
 
-    return await role_service.create(session, role_data.dict())
+    return schema_response(
+        RoleDB.model_validate(await role_service.create(session, role_data.dict())), status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.get('/', response_model=list[RoleDB], dependencies=[Depends(has_permission(RoleAccess.SUPERUSER))])
@@ -32,7 +41,7 @@ async def get_roles(
         role_service: RoleService = Depends(get_role_service),
         session: AsyncSession = Depends(get_async_session)):
 
-    return await role_service.elements(session)
+    return adapter_response(ROLES_ADAPTER, await role_service.elements(session))
 
 
 @router.patch('/{role_id}', response_model=RoleDB, dependencies=[Depends(has_permission(RoleAccess.SUPERUSER))])
@@ -47,7 +56,7 @@ async def update_role(
     if update_role.name in ('superuser', 'user'):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cant change default role')
 
-    return await role_service.update(session, update_role, role_data.dict())
+    return schema_response(RoleDB.model_validate(await role_service.update(session, update_role, role_data.dict())))
 
 
 @router.delete('/{role_id}', response_model=RoleDB, dependencies=[Depends(has_permission(RoleAccess.SUPERUSER))])
@@ -61,7 +70,7 @@ async def delete_role(
     if delete_role.name in ('superuser', 'user'):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cant delete default role')
 
-    return await role_service.delete(session, delete_role)
+    return schema_response(RoleDB.model_validate(await role_service.delete(session, delete_role)))
 
 
 @router.post('/assign', response_model=UserWithRole, dependencies=[Depends(has_permission(RoleAccess.SUPERUSER))])
@@ -80,10 +89,10 @@ async def assign_role(
 
     user = await role_service.assign_role(session, role, user)
 
-    return UserWithRole(
+    return schema_response(UserWithRole(
         username=user.username,
         role=RoleCRUD(name=role.name, access_level=role.access_level)
-    )
+    ))
 
 
 @router.post('/revoke', response_model=UserWithRole, dependencies=[Depends(has_permission(RoleAccess.SUPERUSER))])
@@ -99,7 +108,64 @@ async def revoke_role(
     default_role = await role_service.get_default_role(session)
     user = await role_service.assign_role(session, default_role, user)
 
-    return UserWithRole(
+    return schema_response(UserWithRole(
         username=user.username,
         role=RoleCRUD(name=default_role.name, access_level=default_role.access_level)
-    )
+    ))
+
+
+@router.post(
+    '/assign/bulk',
+    dependencies=[Depends(has_permission(RoleAccess.SUPERUSER))],
+    responses={200: {'content': {NDJSON_MEDIA_TYPE: {}}, 'description': 'Result per user, then totals'}},
+)
+async def assign_role_bulk(
+        target: BulkRoleAssign,
+        role_service: RoleService = Depends(get_role_service),
+        session: AsyncSession = Depends(get_async_session)):
+    """Assign the role to the listed users or to all users with the role `with_role`, in one transaction."""
+    if not (role := await role_service.get_by_name(session, target.role_name)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Role not found')
+
+    return await _change_role_bulk(session, role_service, role, target)
+
+
+@router.post(
+    '/revoke/bulk',
+    dependencies=[Depends(has_permission(RoleAccess.SUPERUSER))],
+    responses={200: {'content': {NDJSON_MEDIA_TYPE: {}}, 'description': 'Result per user, then totals'}},
+)
+async def revoke_role_bulk(
+        target: BulkRoleTarget,
+        role_service: RoleService = Depends(get_role_service),
+        session: AsyncSession = Depends(get_async_session)):
+    """Assign the default role to the listed users or to all users with the role `with_role`, in one transaction."""
+    default_role = await role_service.get_default_role(session)
+
+    return await _change_role_bulk(session, role_service, default_role, target)
+
+
+async def _change_role_bulk(
+        session: AsyncSession, role_service: RoleService, role: Role, target: BulkRoleTarget) -> StreamingResponse:
+    with_role = None
+    if target.with_role is not None and not (with_role := await role_service.get_by_name(session, target.with_role)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Role not found')
+
+    role_name = role.name
+    updated = await role_service.assign_role_bulk(session, role, target.usernames, with_role)
+
+    return StreamingResponse(_bulk_report(role_name, target.usernames, updated), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def _bulk_report(
+        role_name: str, usernames: list[str] | None, updated: list[tuple[UUID, str]],
+        chunk_size: int = 1000) -> AsyncIterator[bytes]:
+    """Yield NDJSON lines of updated, then not found users, and totals. Lines are sent in chunks."""
+    updated_usernames = {username for _, username in updated}
+    not_found = [username for username in dict.fromkeys(usernames or ()) if username not in updated_usernames]
+    results = [BulkRoleResult(username=username, status='updated', role=role_name) for _, username in updated]
+    results += [BulkRoleResult(username=username, status='not_found') for username in not_found]
+
+    for start in range(0, len(results), chunk_size):
+        yield b''.join(ndjson_line(result) for result in results[start:start + chunk_size])
+    yield ndjson_line(BulkRoleSummary(updated=len(updated), not_found=len(not_found)))
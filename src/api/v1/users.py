@@ -0,0 +1,57 @@
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.api.permission import has_permission
+from src.api.responses import NDJSON_MEDIA_TYPE, ndjson_line
+from src.core.constants import RoleAccess
+from src.core.db import get_async_session
+from src.core.hashing import hasher
+from src.schemas.user import UserImportResult, UserImportSummary
+from src.services.user_import import ImportFormat, UserImporter, parse_rows
+from src.services.username_filter import UsernameFilter, get_username_filter
+
+router = APIRouter()
+
+
+@router.post(
+    '/import',
+    dependencies=[Depends(has_permission(RoleAccess.SUPERUSER))],
+    responses={200: {'content': {NDJSON_MEDIA_TYPE: {}}, 'description': 'Row results, then totals'}},
+)
+async def import_users(
+        request: Request,
+        import_format: ImportFormat | None = Query(None, alias='format'),
+        batch_size: int = Query(1000, ge=1, le=10000),
+        report_created: bool = False,
+        username_filter: UsernameFilter = Depends(get_username_filter),
+        session: AsyncSession = Depends(get_async_session)):
+    """
+    Create users from NDJSON or CSV body (by `format` or Content-Type). Fields: username, password, role.
+
+    Response is NDJSON: result of each conflicting or invalid row (and created, if `report_created`),
+    then totals. Rows are committed in batches, so the import is not rolled back on a failure.
+    """
+    if import_format is None:
+        import_format = 'csv' if request.headers.get('content-type', '').startswith('text/csv') else 'ndjson'
+
+    # Read before streaming the response: StreamingResponse listens on the same channel for the disconnect.
+    try:
+        body = (await request.body()).decode()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Body must be UTF-8 encoded')
+    rows = parse_rows(body.splitlines(), import_format)
+    # The pool is shared with logins: half of it is left to them. Large imports are better run with the CLI.
+    importer = UserImporter(session, hasher, batch_size, username_filter, hash_concurrency=max(hasher.max_workers // 2, 1))
+    results = importer.run(rows)
+    return StreamingResponse(_encode(results, report_created), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def _encode(
+        results: AsyncIterator[UserImportResult | UserImportSummary], report_created: bool) -> AsyncIterator[bytes]:
+    async for result in results:
+        if isinstance(result, UserImportResult) and result.status == 'created' and not report_created:
+            continue
+        yield ndjson_line(result)
@@ -0,0 +1,66 @@
+"""
+Pick argon2 parameters for this host, so that a password verification takes about the target time.
+
+Run on the production hardware and put the printed values into .env:
+    python -m src.cli.calibrate_hashing --target-ms 250
+
+Parallelism is the number of cores per concurrent hash: CPUs divided by HASHING_MAX_WORKERS.
+Memory starts from --max-memory and is halved while a single pass is over the target,
+then passes (time cost) are added while the target is not exceeded.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from passlib.hash import argon2
+
+from src.core.config import settings
+
+MIN_MEMORY_COST = 8192  # KiB
+
+
+def measure(time_cost: int, memory_cost: int, parallelism: int, samples: int) -> float:
+    """Return median duration of hashing in milliseconds. Verification runs the same KDF."""
+    handler = argon2.using(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    durations = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        handler.hash('calibration password')
+        durations.append(time.perf_counter() - started_at)
+    return statistics.median(durations) * 1000
+
+
+def calibrate(target_ms: float, max_memory_cost: int, parallelism: int, samples: int) -> tuple[int, int, float]:
+    """Return time cost, memory cost and verification duration closest to the target, but not over it."""
+    memory_cost = max_memory_cost
+    while (duration := measure(1, memory_cost, parallelism, samples)) > target_ms and memory_cost > MIN_MEMORY_COST:
+        memory_cost = max(memory_cost // 2, MIN_MEMORY_COST)
+
+    time_cost = 1
+    while (next_duration := measure(time_cost + 1, memory_cost, parallelism, samples)) <= target_ms:
+        time_cost, duration = time_cost + 1, next_duration
+    return time_cost, memory_cost, duration
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target-ms', type=float, default=250, help='Verification latency budget')
+    parser.add_argument('--max-memory', type=int, default=65536, help='Upper bound of memory cost, KiB')
+    parser.add_argument('--parallelism', type=int, default=max(cpus // (settings.hashing.max_workers or cpus), 1))
+    parser.add_argument('--samples', type=int, default=5)
+    args = parser.parse_args()
+
+    time_cost, memory_cost, duration = calibrate(args.target_ms, args.max_memory, args.parallelism, args.samples)
+    if duration > args.target_ms:
+        print(f'# Target is not reachable: {duration:.0f} ms with the lowest cost')
+    else:
+        print(f'# Verification takes {duration:.0f} ms')
+    print(f'HASHING_ARGON2_TIME_COST={time_cost}')
+    print(f'HASHING_ARGON2_MEMORY_COST={memory_cost}')
+    print(f'HASHING_ARGON2_PARALLELISM={args.parallelism}')
+
+
+if __name__ == '__main__':
+    main()
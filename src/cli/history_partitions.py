@@ -0,0 +1,65 @@
+"""
+Manage monthly partitions of login history.
+
+Convert the table to partitions once, it is locked while rows are copied:
+    python -m src.cli.history_partitions convert
+Create upcoming partitions and drop expired ones daily, e.g. from cron:
+    python -m src.cli.history_partitions maintain --retention-months 12
+Convert back to a plain table:
+    python -m src.cli.history_partitions revert
+"""
+import argparse
+import asyncio
+
+from src.core.config import settings
+from src.core.db import engine
+from src.db.partitions import convert_to_partitioned, convert_to_plain, maintain_partitions
+
+
+async def convert(months_ahead: int):
+    async with engine.begin() as connection:
+        created = await convert_to_partitioned(connection, months_ahead)
+    print(f'Created partitions: {", ".join(created)}')
+
+
+async def maintain(retention_months: int, months_ahead: int):
+    async with engine.begin() as connection:
+        created, dropped = await maintain_partitions(connection, retention_months, months_ahead)
+    print(f'Created partitions: {", ".join(created) or "-"}')
+    print(f'Dropped partitions: {", ".join(dropped) or "-"}')
+
+
+async def revert():
+    async with engine.begin() as connection:
+        await convert_to_plain(connection)
+    print('Converted to a plain table')
+
+
+async def run(args: argparse.Namespace):
+    try:
+        if args.command == 'convert':
+            await convert(args.months_ahead)
+        elif args.command == 'maintain':
+            await maintain(args.retention_months, args.months_ahead)
+        else:
+            await revert()
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert_parser = commands.add_parser('convert', help='Convert the table to monthly partitions')
+    convert_parser.add_argument('--months-ahead', type=int, default=settings.history.partitions_ahead)
+    maintain_parser = commands.add_parser('maintain', help='Create upcoming partitions, drop expired ones')
+    maintain_parser.add_argument('--retention-months', type=int, default=settings.history.retention_months)
+    maintain_parser.add_argument('--months-ahead', type=int, default=settings.history.partitions_ahead)
+    commands.add_parser('revert', help='Convert the table back to a plain one')
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Create users from a NDJSON or CSV file. Fields: username, password, role (optional, default role).
+
+Passwords are hashed in a process pool over all cores. Prints result of each conflicting or invalid row, then totals:
+    python -m src.cli.import_users users.csv --batch-size 5000 > report.ndjson
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import orjson
+
+from src.core.config import settings
+from src.core.db import AsyncSessionLocal, engine
+from src.core.hashing import PasswordHasher
+from src.db.redis import close_redis, create_redis
+from src.schemas.user import UserImportResult
+from src.services.user_import import UserImporter, parse_rows
+from src.services.username_filter import UsernameFilter
+
+
+async def run(path: Path, import_format: str, batch_size: int, workers: int, report_created: bool):
+    hasher = PasswordHasher('process', workers)
+    redis = create_redis(settings.redis)
+    # Imported usernames must reach the filter, otherwise their logins would be rejected as unknown.
+    username_filter = UsernameFilter(redis, settings.username_filter)
+    try:
+        with path.open(newline='', encoding='utf-8-sig') as file:
+            async with AsyncSessionLocal() as session:
+                importer = UserImporter(session, hasher, batch_size, username_filter)
+                async for result in importer.run(parse_rows(file, import_format)):
+                    if isinstance(result, UserImportResult) and result.status == 'created' and not report_created:
+                        continue
+                    sys.stdout.buffer.write(orjson.dumps(result.model_dump(mode='json', exclude_none=True)) + b'\n')
+    finally:
+        hasher.shutdown()
+        await close_redis(redis)
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', type=Path)
+    parser.add_argument('--format', choices=['ndjson', 'csv'], help='By default, by the file extension')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Hashing processes')
+    parser.add_argument('--report-created', action='store_true', help='Print created rows too')
+    args = parser.parse_args()
+
+    import_format = args.format or ('csv' if args.path.suffix.lower() == '.csv' else 'ndjson')
+    asyncio.run(run(args.path, import_format, args.batch_size, args.workers, args.report_created))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import jwt
+from async_fastapi_jwt_auth import AuthJWT
+from async_fastapi_jwt_auth.exceptions import AuthJWTException
+from fastapi import Request, Response
+
+
+class AuthContext(AuthJWT):
+    """
+    AuthJWT, that verifies signature of each token once per request.
+
+    AuthJWT decodes and verifies the token on every claims access, `jwt_required` alone does it three times.
+    FastAPI creates a single instance per request for all dependencies and the handler, so claims verified
+    by `has_permission` are reused by the handler and services.
+    """
+
+    def __init__(self, req: Request = None, res: Response = None):
+        super().__init__(req, res)
+        self._verified_claims: dict[tuple[str, str | None], dict] = {}
+
+    async def _verified_token(self, encoded_token: str, issuer: str | None = None) -> dict:
+        if (encoded_token, issuer) not in self._verified_claims:
+            self._verified_claims[(encoded_token, issuer)] = await super()._verified_token(encoded_token, issuer)
+        return self._verified_claims[(encoded_token, issuer)]
+
+    async def get_access_token_claims(self) -> dict | None:
+        """Return verified claims of the access token from cookies, or None if it is missing or invalid."""
+        if not (encoded_token := self._request.cookies.get(self._access_cookie_key)):
+            return None
+        try:
+            return await self._verified_token(encoded_token)
+        except AuthJWTException:
+            return None
+
+    @staticmethod
+    def get_issued_claims(encoded_token: str) -> dict:
+        """Return claims of a token issued by this service in the current request, without signature check."""
+        return jwt.decode(encoded_token, options={'verify_signature': False})
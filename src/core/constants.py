@@ -10,6 +10,12 @@ SUPERUSER_ROLE_DATA = {
     'access_level': 20
 }
 
+ROLES_INVALIDATION_CHANNEL = 'roles:invalidate'
+CLAIMS_VERSIONS_KEY = 'claims_versions:bumped_at'
+CLAIMS_VERSION_CHANNEL = 'claims:version'
+REVOKED_TOKENS_STREAM = 'tokens:revoked'
+USERNAME_FILTER_KEY = 'usernames:bloom'
+
 
 class RoleAccess(IntEnum):
     USER = 1
@@ -1,10 +1,23 @@
+import time
 import uuid
 
-from sqlalchemy import UUID, Column
-from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import UUID, Column, event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, declared_attr
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from src.core.config import settings
+from src.core.config import DatabaseSettings, settings
+from src.core.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKOUT_TIMEOUTS,
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_OVERFLOW,
+    DB_POOL_SIZE,
+    record_checkout,
+    record_query
+)
+from src.core.tracing import instrument_engine
 
 
 class PreBase(AsyncAttrs):
@@ -17,17 +30,80 @@ class PreBase(AsyncAttrs):
 
 Base = declarative_base(cls=PreBase)
 
-engine = create_async_engine(settings.database_url)
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool, which records checkout wait time and counts of connections to metrics."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        DB_POOL_SIZE.set(self.size())
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except TimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+        record_checkout()
+        self._record_usage()
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._record_usage()
+
+    def _record_usage(self):
+        DB_POOL_CHECKED_OUT.set(self.checkedout())
+        # Overflow counts down from -pool_size while the pool is not full.
+        DB_POOL_OVERFLOW.set(max(self.overflow(), 0))
+
+
+def create_engine(url: str, config: DatabaseSettings) -> AsyncEngine:
+    if config.pgbouncer:
+        # Transaction pooling PgBouncer may run each statement on a different server connection,
+        # so server-side prepared statements must not be cached or reused by name.
+        connect_args = {
+            'statement_cache_size': 0,
+            'prepared_statement_cache_size': 0,
+            'prepared_statement_name_func': lambda: f'__asyncpg_{uuid.uuid4()}__',
+        }
+    else:
+        connect_args = {
+            'statement_cache_size': config.statement_cache_size,
+            'prepared_statement_cache_size': config.prepared_statement_cache_size,
+        }
+
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=config.pool_size,
+        max_overflow=config.max_overflow,
+        pool_timeout=config.pool_timeout,
+        pool_recycle=config.pool_recycle,
+        pool_pre_ping=config.pool_pre_ping,
+        connect_args=connect_args,
+    )
+    event.listen(engine.sync_engine, 'before_cursor_execute', lambda *_: record_query())
+    instrument_engine(engine)
+    return engine
+
+
+engine = create_engine(settings.database_url, settings.database)
 
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
 async def get_async_session() -> AsyncSession:
+    """
+    Session of a request. A connection is checked out of the pool on the first statement, not here:
+    requests rejected by authentication before any query cost no DB work (see `http_request_db_checkouts`).
+    """
     async with AsyncSessionLocal() as session:
         try:
             yield session
         except Exception:
-            await session.rollback()
+            if session.in_transaction():
+                await session.rollback()
             raise
-        finally:
-            await session.close()
@@ -0,0 +1,103 @@
+"""
+Password hashing in a bounded worker pool.
+
+Argon2 is deliberately expensive, so hashing and verification are never run on the event loop:
+a single login would stall every other coroutine of the worker for the whole KDF cost.
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from src.core.config import settings
+from src.core.metrics import PASSWORD_HASHING_DURATION, PASSWORD_HASHING_QUEUE_DEPTH
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=settings.hashing.argon2_time_cost,
+    argon2__memory_cost=settings.hashing.argon2_memory_cost,
+    argon2__parallelism=settings.hashing.argon2_parallelism,
+)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, password_hash: str | None) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+def _verify_and_update(password: str, password_hash: str | None) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+class PasswordHasher:
+    """Run hashing functions in a thread or process pool. The pool is created lazily, after the worker fork."""
+
+    def __init__(self, executor_type: str = 'thread', max_workers: int | None = None):
+        self.executor_type = executor_type
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pending = 0
+        self._executor: Executor | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Count of tasks waiting for a free worker. Non-zero value means the pool is saturated."""
+        return max(self.pending - self.max_workers, 0)
+
+    def stats(self) -> dict:
+        return {
+            'executor': self.executor_type,
+            'max_workers': self.max_workers,
+            'pending': self.pending,
+            'queue_depth': self.queue_depth,
+        }
+
+    async def hash(self, password: str) -> str:
+        return await self._run('hash', _hash, password)
+
+    async def verify(self, password: str, password_hash: str | None) -> bool:
+        return await self._run('verify', _verify, password, password_hash)
+
+    async def verify_and_update(self, password: str, password_hash: str | None) -> tuple[bool, str | None]:
+        """Verify the password. If it is correct and the hash has outdated parameters, also return a new hash."""
+        return await self._run('verify', _verify_and_update, password, password_hash)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.executor_type == 'process' else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.max_workers)
+        return self._executor
+
+    async def _run(self, operation: str, func, *args):
+        self.pending += 1
+        PASSWORD_HASHING_QUEUE_DEPTH.set(self.queue_depth)
+        try:
+            with PASSWORD_HASHING_DURATION.labels(operation).time():
+                return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+            PASSWORD_HASHING_QUEUE_DEPTH.set(self.queue_depth)
+
+
+hasher = PasswordHasher(settings.hashing.executor, settings.hashing.max_workers)
+
+
+async def hash_password(password: str) -> str:
+    return await hasher.hash(password)
+
+
+async def verify_password(password: str, password_hash: str | None) -> bool:
+    return await hasher.verify(password, password_hash)
+
+
+async def verify_and_update_password(password: str, password_hash: str | None) -> tuple[bool, str | None]:
+    return await hasher.verify_and_update(password, password_hash)
@@ -0,0 +1,78 @@
+"""
+Prometheus metrics.
+
+Under gunicorn, PROMETHEUS_MULTIPROC_DIR must point to an empty directory before the workers start: each worker
+writes samples to its own files there, and `/metrics` served by any worker aggregates all of them.
+"""
+import os
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Duration of HTTP requests', ['method', 'route', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'HTTP requests being processed', ['method', 'route'], multiprocess_mode='livesum'
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL statements executed per HTTP request', ['route'], buckets=(0, 1, 2, 3, 5, 8, 13, 21)
+)
+REQUEST_DB_CHECKOUTS = Histogram(
+    'http_request_db_checkouts', 'Connections checked out from the engine pool per HTTP request', ['route', 'status'],
+    buckets=(0, 1, 2, 3, 5),
+)
+PASSWORD_HASHING_DURATION = Histogram(
+    'password_hashing_duration_seconds', 'Duration of argon2 hashing, including wait for a pool worker', ['operation'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PASSWORD_HASHING_QUEUE_DEPTH = Gauge(
+    'password_hashing_queue_depth', 'Hashing tasks waiting for a free pool worker', multiprocess_mode='livesum'
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a connection from the engine pool',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+DB_POOL_SIZE = Gauge('db_pool_size', 'Connections kept open by the engine pool', multiprocess_mode='livesum')
+DB_POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections of the engine pool in use', multiprocess_mode='livesum')
+DB_POOL_OVERFLOW = Gauge('db_pool_overflow', 'Connections opened beyond the engine pool size', multiprocess_mode='livesum')
+DB_POOL_CHECKOUT_TIMEOUTS = Counter('db_pool_checkout_timeouts_total', 'Engine pool checkouts failed with timeout')
+DB_QUERIES = Counter('db_queries_total', 'SQL statements executed')
+REDIS_POOL_CONNECTIONS = Gauge(
+    'redis_pool_connections', 'Connections of the Redis client pool', ['state'], multiprocess_mode='livesum'
+)
+REDIS_COMMAND_DURATION = Histogram(
+    'redis_command_duration_seconds', 'Duration of Redis commands', ['command'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1),
+)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    checkouts: int = 0
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar('request_stats', default=None)
+
+
+def record_query():
+    DB_QUERIES.inc()
+    if stats := request_stats.get():
+        stats.queries += 1
+
+
+def record_checkout():
+    if stats := request_stats.get():
+        stats.checkouts += 1
+
+
+def generate_metrics() -> bytes:
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
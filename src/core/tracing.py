@@ -0,0 +1,118 @@
+"""
+Optional tracing with OpenTelemetry, disabled by default.
+
+When enabled, spans are created for HTTP requests (`TracingMiddleware`), public methods of services (`traced_methods`),
+SQL statements (`instrument_engine`) and Redis commands. W3C trace context of incoming requests is continued.
+Spans are exported to stdout or to a file, so tracing works without a collector.
+"""
+import inspect
+from contextlib import nullcontext
+from functools import wraps
+from typing import TextIO
+
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode, Tracer
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.core.config import TracingSettings
+
+# None while tracing is disabled: instrumented code checks it and skips span creation entirely.
+tracer: Tracer | None = None
+_provider: TracerProvider | None = None
+_trace_file: TextIO | None = None
+
+
+def setup_tracing(config: TracingSettings):
+    """Start exporting spans. Called in each worker process, as the export thread does not survive fork."""
+    global tracer, _provider, _trace_file
+
+    if config.exporter == 'file':
+        _trace_file = open(config.file_path, 'a')
+        exporter = ConsoleSpanExporter(out=_trace_file, formatter=lambda span: span.to_json(indent=None) + '\n')
+    else:
+        exporter = ConsoleSpanExporter()
+
+    _provider = TracerProvider(
+        resource=Resource.create({'service.name': config.service_name}),
+        sampler=ParentBased(TraceIdRatioBased(config.sample_ratio)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    tracer = _provider.get_tracer(__name__)
+
+
+def shutdown_tracing():
+    """Export pending spans and stop tracing."""
+    global tracer, _provider, _trace_file
+
+    if _provider is not None:
+        _provider.shutdown()
+    if _trace_file is not None:
+        _trace_file.close()
+    tracer, _provider, _trace_file = None, None, None
+
+
+def span(name: str, **kwargs):
+    """Return context manager of a new current span, or a no-op one while tracing is disabled."""
+    return tracer.start_as_current_span(name, **kwargs) if tracer else nullcontext()
+
+
+def traced_methods(cls):
+    """Class decorator, which wraps public coroutine methods of the class into spans named `Class.method`."""
+    for name, method in list(vars(cls).items()):
+        if not name.startswith('_') and inspect.iscoroutinefunction(method):
+            setattr(cls, name, _traced(method, f'{cls.__name__}.{name}'))
+    return cls
+
+
+def _traced(method, span_name: str):
+    @wraps(method)
+    async def wrapper(*args, **kwargs):
+        if tracer is None:
+            return await method(*args, **kwargs)
+        with tracer.start_as_current_span(span_name):
+            return await method(*args, **kwargs)
+    return wrapper
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Create a span for each SQL statement executed by the engine."""
+    for name, listener in _ENGINE_LISTENERS:
+        event.listen(engine.sync_engine, name, listener)
+
+
+def uninstrument_engine(engine: AsyncEngine):
+    for name, listener in _ENGINE_LISTENERS:
+        event.remove(engine.sync_engine, name, listener)
+
+
+def _start_statement_span(conn, cursor, statement, parameters, context, executemany):
+    if tracer is None or context is None:
+        return
+    context._tracing_span = tracer.start_span(
+        statement.split(None, 1)[0].upper() if statement else 'SQL',
+        kind=SpanKind.CLIENT,
+        attributes={'db.system': 'postgresql', 'db.statement': statement},
+    )
+
+
+def _end_statement_span(conn, cursor, statement, parameters, context, executemany):
+    if statement_span := getattr(context, '_tracing_span', None):
+        statement_span.end()
+
+
+def _fail_statement_span(exception_context):
+    if statement_span := getattr(exception_context.execution_context, '_tracing_span', None):
+        statement_span.record_exception(exception_context.original_exception)
+        statement_span.set_status(Status(StatusCode.ERROR))
+        statement_span.end()
+
+
+_ENGINE_LISTENERS = (
+    ('before_cursor_execute', _start_statement_span),
+    ('after_cursor_execute', _end_statement_span),
+    ('handle_error', _fail_statement_span),
+)
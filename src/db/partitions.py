@@ -0,0 +1,185 @@
+"""
+Monthly range partitions of the loginhistory table.
+
+Partitions are named `loginhistory_YYYY_MM`. Rows outside of existing partitions go to `loginhistory_default`,
+which stays empty as long as partitions are created ahead (see `maintain_partitions`).
+
+The layout is switched by `convert_to_partitioned` and `convert_to_plain`, not by migrations, so that the alembic
+revision of the database does not depend on the chosen layout.
+"""
+import logging
+import re
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = 'loginhistory'
+DEFAULT_PARTITION_NAME = f'{TABLE_NAME}_default'
+PARTITION_NAME_RE = re.compile(rf'^{TABLE_NAME}_(\d{{4}})_(\d{{2}})$')
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    month_index = month.year * 12 + month.month - 1 + count
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f'{TABLE_NAME}_{month:%Y_%m}'
+
+
+def create_partition_sql(month: date) -> str:
+    return (
+        f'CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {TABLE_NAME} '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def rename_table_sql(old_name: str, new_name: str) -> list[str]:
+    """Rename the table with its primary key and index, freeing their names for the new table."""
+    return [
+        f'ALTER TABLE {old_name} RENAME TO {new_name}',
+        f'ALTER TABLE {new_name} RENAME CONSTRAINT {old_name}_pkey TO {new_name}_pkey',
+        f'ALTER INDEX IF EXISTS ix_{old_name}_user_id_login_time RENAME TO ix_{new_name}_user_id_login_time',
+    ]
+
+
+def create_index_sql() -> str:
+    return f'CREATE INDEX ix_{TABLE_NAME}_user_id_login_time ON {TABLE_NAME} (user_id, login_time DESC, id DESC)'
+
+
+def drop_partition_sql(name: str) -> list[str]:
+    return [f'ALTER TABLE {TABLE_NAME} DETACH PARTITION {name}', f'DROP TABLE {name}']
+
+
+async def is_partitioned(connection: AsyncConnection) -> bool:
+    stmt = text('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table_name)')
+    return (await connection.execute(stmt, {'table_name': TABLE_NAME})).first() is not None
+
+
+async def get_partition_months(connection: AsyncConnection) -> dict[str, date]:
+    """Return monthly partitions of the table: name to first day of the month."""
+    stmt = text(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = to_regclass(:table_name)'
+    )
+    partitions = {}
+    for name in (await connection.scalars(stmt, {'table_name': TABLE_NAME})).all():
+        if match := PARTITION_NAME_RE.match(name):
+            partitions[name] = date(int(match[1]), int(match[2]), 1)
+    return partitions
+
+
+async def convert_to_partitioned(connection: AsyncConnection, months_ahead: int, today: date | None = None) -> list[str]:
+    """
+    Convert the plain table to monthly partitions, from the month of the oldest login to `months_ahead` months ahead.
+
+    Rows are copied within the transaction of the connection, the table is locked until it is committed.
+
+    :return: Names of created monthly partitions.
+    """
+    if await is_partitioned(connection):
+        raise ValueError(f'Table {TABLE_NAME} is already partitioned')
+
+    old_name = f'{TABLE_NAME}_old'
+    for stmt in rename_table_sql(TABLE_NAME, old_name):
+        await connection.execute(text(stmt))
+    await connection.execute(text(
+        f'CREATE TABLE {TABLE_NAME} ('
+        'user_id UUID NOT NULL REFERENCES "user" (id), '
+        'login_time TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(), '
+        'id UUID NOT NULL, '
+        'PRIMARY KEY (id, login_time)'
+        ') PARTITION BY RANGE (login_time)'
+    ))
+    await connection.execute(text(f'CREATE TABLE {DEFAULT_PARTITION_NAME} PARTITION OF {TABLE_NAME} DEFAULT'))
+
+    current_month = month_start(today or datetime.now().date())
+    oldest_login = (await connection.execute(text(f'SELECT min(login_time) FROM {old_name}'))).scalar()
+    month = min(month_start(oldest_login.date()), current_month) if oldest_login else current_month
+    created = []
+    while month <= add_months(current_month, months_ahead):
+        await connection.execute(text(create_partition_sql(month)))
+        created.append(partition_name(month))
+        month = add_months(month, 1)
+
+    await connection.execute(text(
+        f'INSERT INTO {TABLE_NAME} (user_id, login_time, id) '
+        f'SELECT user_id, coalesce(login_time, now()), id FROM {old_name}'
+    ))
+    await connection.execute(text(f'DROP TABLE {old_name}'))
+    await connection.execute(text(create_index_sql()))
+
+    logger.info('Login history converted to partitions: %s', created)
+    return created
+
+
+async def convert_to_plain(connection: AsyncConnection):
+    """Convert the partitioned table back to a plain one, copying rows of all partitions."""
+    if not await is_partitioned(connection):
+        raise ValueError(f'Table {TABLE_NAME} is not partitioned')
+
+    old_name = f'{TABLE_NAME}_old'
+    for stmt in rename_table_sql(TABLE_NAME, old_name):
+        await connection.execute(text(stmt))
+    await connection.execute(text(
+        f'CREATE TABLE {TABLE_NAME} ('
+        'user_id UUID NOT NULL REFERENCES "user" (id), '
+        'login_time TIMESTAMP WITHOUT TIME ZONE, '
+        'id UUID NOT NULL PRIMARY KEY'
+        ')'
+    ))
+    await connection.execute(text(
+        f'INSERT INTO {TABLE_NAME} (user_id, login_time, id) SELECT user_id, login_time, id FROM {old_name}'
+    ))
+    # Partitions are dropped with the partitioned table.
+    await connection.execute(text(f'DROP TABLE {old_name}'))
+    await connection.execute(text(create_index_sql()))
+
+    logger.info('Login history converted to a plain table')
+
+
+async def maintain_partitions(
+    connection: AsyncConnection, retention_months: int, months_ahead: int, today: date | None = None
+) -> (list[str], list[str]):
+    """
+    Create partitions for the current and upcoming months, drop partitions older than retention period.
+
+    Dropping a partition is instant and does not leave dead tuples behind, unlike DELETE of old rows.
+
+    :param connection: A database connection.
+    :param retention_months: Count of months to keep, including the current one.
+    :param months_ahead: Count of upcoming months to create partitions for.
+    :param today: Current date, defaults to today.
+    :return: Names of created and dropped partitions.
+    """
+    if not await is_partitioned(connection):
+        raise ValueError(f'Table {TABLE_NAME} is not partitioned')
+
+    current_month = month_start(today or datetime.now().date())
+    existing = await get_partition_months(connection)
+
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current_month, offset)
+        if partition_name(month) not in existing:
+            await connection.execute(text(create_partition_sql(month)))
+            created.append(partition_name(month))
+
+    oldest_kept_month = add_months(current_month, 1 - retention_months)
+    dropped = []
+    for name, month in sorted(existing.items(), key=lambda item: item[1]):
+        if month < oldest_kept_month:
+            for stmt in drop_partition_sql(name):
+                await connection.execute(text(stmt))
+            dropped.append(name)
+
+    logger.info('Login history partitions created: %s, dropped: %s', created, dropped)
+    return created, dropped
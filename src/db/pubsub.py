@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis, RedisCluster
+from redis.exceptions import ConnectionError, TimeoutError
+
+from src.db.redis import get_pubsub_client
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str | None], None | Awaitable[None]]
+
+
+async def listen_channels(
+    redis: Redis | RedisCluster, handlers: dict[str, Handler], reconnect_delay: float = 1.0, poll_timeout: float = 1.0
+):
+    """
+    Dispatch messages published to Redis channels to their handlers. Runs until cancelled.
+
+    Handler, sync or async, is called with message data, or with None after every (re)subscription:
+    messages published while the listener was disconnected are lost, so local state must be reset.
+
+    :param redis: A Redis client.
+    :param handlers: Mapping of channel name to handler.
+    :param reconnect_delay: Seconds to wait before reconnecting after connection error.
+    :param poll_timeout: Seconds to wait for a message before polling again. Shorter than the socket timeout.
+    """
+    client = await get_pubsub_client(redis)
+    try:
+        while True:
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(*handlers)
+                    while True:
+                        if not (message := await pubsub.get_message(timeout=poll_timeout)):
+                            continue
+                        if message['type'] in ('message', 'subscribe'):
+                            data = message['data'] if message['type'] == 'message' else None
+                            if asyncio.iscoroutine(result := handlers[message['channel']](data)):
+                                await result
+            except (ConnectionError, TimeoutError) as exc:
+                logger.warning('Redis pub/sub connection lost: %s. Reconnecting in %s s', exc, reconnect_delay)
+                await asyncio.sleep(reconnect_delay)
+    finally:
+        if client is not redis:
+            await client.aclose()
@@ -1,9 +1,145 @@
 from typing import Optional
 
-from redis.asyncio import Redis
+from opentelemetry.trace import SpanKind
+from redis.asyncio import BlockingConnectionPool, Redis, RedisCluster, Sentinel
+from redis.asyncio.sentinel import SentinelConnectionPool
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
 
-redis: Optional[Redis] = None
+from src.core import tracing
+from src.core.config import RedisSettings
+from src.core.metrics import REDIS_COMMAND_DURATION, REDIS_POOL_CONNECTIONS
+
+redis: Optional[Redis | RedisCluster] = None
+
+
+class PoolMetricsMixin:
+    """Connection pool mixin, which records counts of connections in use and idle to metrics."""
+
+    async def get_connection(self, *args, **kwargs):
+        connection = await super().get_connection(*args, **kwargs)
+        record_pool_usage(len(self._in_use_connections), len(self._available_connections))
+        return connection
+
+    async def release(self, connection):
+        await super().release(connection)
+        record_pool_usage(len(self._in_use_connections), len(self._available_connections))
+
+
+class InstrumentedBlockingConnectionPool(PoolMetricsMixin, BlockingConnectionPool):
+    pass
+
+
+class InstrumentedSentinelConnectionPool(PoolMetricsMixin, SentinelConnectionPool, BlockingConnectionPool):
+    """Pool of connections to the master found by Sentinel, waiting for a free connection like BlockingConnectionPool."""
 
 
 async def get_redis() -> Redis:
     return redis
+
+
+def create_redis(config: RedisSettings) -> Redis | RedisCluster:
+    """
+    Create Redis client with bounded connection pool, timeouts and retries.
+    Pools of standalone and sentinel clients record their usage to metrics, cluster clients are recorded by `/metrics`.
+
+    In standalone and sentinel modes a request waits at most `pool_timeout` seconds for a free connection,
+    then fails with ConnectionError, instead of piling up while Redis is slow.
+    """
+    connection_kwargs = {
+        'decode_responses': True,
+        'socket_timeout': config.socket_timeout,
+        'socket_connect_timeout': config.socket_connect_timeout,
+        'health_check_interval': config.health_check_interval,
+        'retry': Retry(ExponentialBackoff(cap=config.retry_backoff_cap, base=config.retry_backoff_base), config.retry_attempts),
+    }
+
+    if config.mode == 'cluster':
+        return instrument(
+            RedisCluster(host=config.host, port=config.port, max_connections=config.max_connections, **connection_kwargs)
+        )
+
+    if config.mode == 'sentinel':
+        sentinels = [(host, int(port)) for host, port in (address.rsplit(':', 1) for address in config.sentinels)]
+        sentinel = Sentinel(
+            sentinels,
+            sentinel_kwargs={'socket_timeout': config.socket_timeout, 'socket_connect_timeout': config.socket_connect_timeout},
+            **connection_kwargs,
+        )
+        return instrument(sentinel.master_for(
+            config.sentinel_service_name,
+            connection_pool_class=InstrumentedSentinelConnectionPool,
+            max_connections=config.max_connections,
+            timeout=config.pool_timeout,
+        ))
+
+    pool = InstrumentedBlockingConnectionPool(
+        host=config.host,
+        port=config.port,
+        max_connections=config.max_connections,
+        timeout=config.pool_timeout,
+        **connection_kwargs,
+    )
+    return instrument(Redis(connection_pool=pool))
+
+
+def instrument(client: Redis | RedisCluster) -> Redis | RedisCluster:
+    """Record duration and trace span of each command of the client, including script calls. Pipelines are not recorded."""
+    execute_command = client.execute_command
+
+    async def timed_execute_command(*args, **options):
+        command = str(args[0]).upper()
+        with REDIS_COMMAND_DURATION.labels(command).time(), tracing.span(
+            command, kind=SpanKind.CLIENT, attributes={'db.system': 'redis'}
+        ):
+            return await execute_command(*args, **options)
+
+    client.execute_command = timed_execute_command
+    return client
+
+
+async def close_redis(client: Redis | RedisCluster):
+    if isinstance(client, RedisCluster):
+        await client.aclose()
+    else:
+        # Pool passed to the client explicitly is not closed by default.
+        await client.aclose(close_connection_pool=True)
+
+
+async def get_pubsub_client(client: Redis | RedisCluster) -> Redis:
+    """
+    Return client that supports pub/sub.
+
+    RedisCluster has no pub/sub support, but messages published to any node are broadcast to all nodes,
+    so subscribing on a single node is enough.
+    """
+    if not isinstance(client, RedisCluster):
+        return client
+
+    await client.initialize()
+    node = client.get_default_node()
+    return Redis(host=node.host, port=node.port, **node.connection_kwargs)
+
+
+def pool_stats(client: Redis | RedisCluster) -> dict:
+    """Return count of connections in use, idle and allowed. Reads private state of redis-py pools."""
+    if isinstance(client, RedisCluster):
+        nodes = client.get_nodes()
+        idle = sum(len(node._free) for node in nodes)
+        return {
+            'in_use': sum(len(node._connections) for node in nodes) - idle,
+            'idle': idle,
+            'max_connections': sum(node.max_connections for node in nodes),
+        }
+
+    pool = client.connection_pool
+    return {
+        'in_use': len(pool._in_use_connections),
+        'idle': len(pool._available_connections),
+        'max_connections': pool.max_connections,
+    }
+
+
+def record_pool_usage(in_use: int, idle: int):
+    REDIS_POOL_CONNECTIONS.labels('in_use').set(in_use)
+    REDIS_POOL_CONNECTIONS.labels('idle').set(idle)
@@ -0,0 +1,41 @@
+import asyncio
+import logging
+from typing import Callable
+
+from redis.asyncio import Redis, RedisCluster
+from redis.exceptions import ConnectionError, TimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+async def follow_stream(
+    redis: Redis | RedisCluster,
+    stream: str,
+    handler: Callable[[dict], None],
+    last_id: str = '0',
+    block_ms: int = 1000,
+    reconnect_delay: float = 1.0,
+    count: int = 100,
+):
+    """
+    Pass entries of a Redis stream to the handler in order. Runs until cancelled.
+
+    Unlike pub/sub, entries added while disconnected are not lost: reading resumes after the last handled entry.
+
+    :param redis: A Redis client.
+    :param stream: Stream key.
+    :param handler: Called with fields of each entry.
+    :param last_id: Read entries after this ID, '0' to read the stream from the beginning.
+    :param block_ms: Milliseconds to wait for new entries before polling again. Shorter than the socket timeout.
+    :param reconnect_delay: Seconds to wait before reconnecting after connection error.
+    :param count: Maximum count of entries read at once.
+    """
+    while True:
+        try:
+            for _, entries in await redis.xread({stream: last_id}, count=count, block=block_ms) or []:
+                for entry_id, fields in entries:
+                    handler(fields)
+                    last_id = entry_id
+        except (ConnectionError, TimeoutError) as exc:
+            logger.warning('Redis stream %s connection lost: %s. Reconnecting in %s s', stream, exc, reconnect_delay)
+            await asyncio.sleep(reconnect_delay)
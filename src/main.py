@@ -1,22 +1,65 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from async_fastapi_jwt_auth.exceptions import AuthJWTException
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
-from redis.asyncio import Redis
+from fastapi.responses import ORJSONResponse
 
 from src.api.errors import account_exception_handler, authjwt_exception_handler
+from src.api.middleware import MetricsMiddleware, TracingMiddleware
 from src.api.routers import main_router
 from src.core import logger
 from src.core.config import settings
+from src.core.constants import CLAIMS_VERSION_CHANNEL, ROLES_INVALIDATION_CHANNEL
+from src.core.db import AsyncSessionLocal
+from src.core.hashing import hasher
+from src.core.tracing import setup_tracing, shutdown_tracing
 from src.db import redis
+from src.db.pubsub import listen_channels
+from src.services.authentication import get_token_denylist
+from src.services.history import LoginHistoryWriter, get_history_service
+from src.services.roles import get_role_service
+from src.services.username_filter import get_username_filter
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    redis.redis = Redis(host=settings.redis.host, port=settings.redis.port, decode_responses=True)
+    if settings.tracing.enabled:
+        setup_tracing(settings.tracing)
+    redis.redis = redis.create_redis(settings.redis)
+    # Called with keyword argument, as FastAPI does, to get the same cached instance as request handlers.
+    role_service = get_role_service(redis=redis.redis)
+    listener = asyncio.create_task(listen_channels(redis.redis, {
+        ROLES_INVALIDATION_CHANNEL: role_service.cache.clear,
+        CLAIMS_VERSION_CHANNEL: role_service.claims_versions.handle_message,
+    }))
+    revocations_follower = asyncio.create_task(
+        get_token_denylist(redis=redis.redis).follow(block_ms=settings.cache.denylist_stream_block_ms)
+    )
+    username_filter_builder = asyncio.create_task(
+        get_username_filter(redis=redis.redis).keep_built(AsyncSessionLocal, settings.username_filter.check_interval)
+    )
+
+    history_service = get_history_service()
+    if settings.history.write_behind:
+        history_service.writer = LoginHistoryWriter(
+            AsyncSessionLocal,
+            batch_size=settings.history.batch_size,
+            flush_interval=settings.history.flush_interval_ms / 1000,
+            queue_size=settings.history.queue_size,
+        )
+        history_service.writer.start()
     yield
-    await redis.redis.close()
+    if history_service.writer:
+        await history_service.writer.stop()
+        history_service.writer = None
+    for task in (listener, revocations_follower, username_filter_builder):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await redis.close_redis(redis.redis)
+    hasher.shutdown()
+    shutdown_tracing()
 
 
 app = FastAPI(
@@ -25,11 +68,13 @@ app = FastAPI(
     lifespan=lifespan,
     log_config=logger.LOGGING_DICT_CONFIG,
     log_level=settings.logger.level,
-    default_response_class=JSONResponse,
+    default_response_class=ORJSONResponse,
 )
 app.add_exception_handler(AuthJWTException, authjwt_exception_handler)
 app.add_exception_handler(ValueError, account_exception_handler)
 app.include_router(main_router)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,4 @@
-from sqlalchemy import UUID, Column, DateTime, ForeignKey, func
+from sqlalchemy import UUID, Column, DateTime, ForeignKey, Index, func, text
 from sqlalchemy.orm import relationship
 
 from src.core.db import Base
@@ -9,3 +9,7 @@ class LoginHistory(Base):
     login_time = Column(DateTime, default=func.now())
 
     user = relationship("User", back_populates="login_history")
+
+    __table_args__ = (
+        Index('ix_loginhistory_user_id_login_time', 'user_id', text('login_time DESC'), text('id DESC')),
+    )
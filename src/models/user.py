@@ -1,11 +1,10 @@
 from fastapi import HTTPException, status
-from passlib.context import CryptContext
 from sqlalchemy import UUID, Column, ForeignKey, String
 from sqlalchemy.orm import relationship, validates
 
+from src.core import hashing
 from src.core.db import Base
-
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+from src.core.metrics import PASSWORD_HASHING_DURATION
 
 
 class User(Base):
@@ -18,10 +17,10 @@ class User(Base):
 
     @validates('username')
     def validate_username(self, key, username):
+        # Username vs password rule is checked in `validate_password`, where both plaintexts are known
+        # (registration, password change). Checking it here would take an argon2 verify on every rename.
         if len(username) < 4:
             raise ValueError('Username length must be > 3')
-        if self.is_correct_password(username):
-            raise ValueError('Username cannot be same as password')
         return username
 
     @property
@@ -30,15 +29,38 @@ class User(Base):
 
     @password.setter
     def password(self, password: str):
+        self.validate_password(password)
+        with PASSWORD_HASHING_DURATION.labels('hash').time():
+            self.password_hash = hashing.pwd_context.hash(password)
+
+    def validate_password(self, password: str):
         if len(password) < 8:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Password length must be > 7')
         if password == self.username:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Password cannot be same as Username')
 
-        self.password_hash = pwd_context.hash(password)
+    async def set_password(self, password: str):
+        """Same as `password` setter, but hashing runs in the hashing pool."""
+        self.validate_password(password)
+        self.password_hash = await hashing.hash_password(password)
 
     def is_correct_password(self, password: str) -> bool:
-        return pwd_context.verify(password, self.password_hash)
+        with PASSWORD_HASHING_DURATION.labels('verify').time():
+            return hashing.pwd_context.verify(password, self.password_hash)
+
+    async def verify_password(self, password: str) -> bool:
+        """Same as `is_correct_password`, but verification runs in the hashing pool."""
+        return await hashing.verify_password(password, self.password_hash)
+
+    async def verify_and_update_password(self, password: str) -> bool:
+        """
+        Same as `verify_password`, but also replace the hash if it has outdated argon2 parameters.
+        The user is left modified in the session then.
+        """
+        verified, new_hash = await hashing.verify_and_update_password(password, self.password_hash)
+        if new_hash:
+            self.password_hash = new_hash
+        return verified
 
     def __repr__(self):
         return f'<User(email={self.username})>'
@@ -9,3 +9,12 @@ class PageParams(BaseModel):
 
     page: Annotated[int, Query(description='Page number', ge=1)] = 1
     size: Annotated[int, Query(description='Page size', ge=1, le=100)] = 10
+
+
+class CursorParams(BaseModel):
+    """Request query params for cursor paginated API."""
+
+    cursor: Annotated[
+        str | None,
+        Query(description='Cursor from `next` of the previous page. Empty value requests the first page'),
+    ] = None
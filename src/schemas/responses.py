@@ -16,6 +16,7 @@ class PagedResponseSchema(BaseModel, Generic[T]):
     size: int
     first: int = 1
     last: int
+    last_is_estimate: bool = False
     items: list[T]
 
     @computed_field
@@ -27,3 +28,11 @@ class PagedResponseSchema(BaseModel, Generic[T]):
     @property
     def next(self) -> int | None:
         return self.page + 1 if self.page < self.last else None
+
+
+class CursorPagedResponseSchema(BaseModel, Generic[T]):
+    """Response schema for any cursor paged API."""
+
+    size: int
+    next: str | None = None
+    items: list[T]
@@ -1,4 +1,6 @@
-from pydantic import UUID4, BaseModel, ConfigDict
+from typing import Literal
+
+from pydantic import UUID4, BaseModel, ConfigDict, Field, model_validator
 
 
 class RoleDB(BaseModel):
@@ -12,3 +14,31 @@ class RoleDB(BaseModel):
 class RoleCRUD(BaseModel):
     name: str
     access_level: int
+
+
+class BulkRoleTarget(BaseModel):
+    """Users of a bulk role change: listed by username or all users with a role."""
+    usernames: list[str] | None = Field(None, max_length=100_000)
+    with_role: str | None = None
+
+    @model_validator(mode='after')
+    def check_target(self) -> 'BulkRoleTarget':
+        if (self.usernames is None) == (self.with_role is None):
+            raise ValueError('Either usernames or with_role must be set')
+        return self
+
+
+class BulkRoleAssign(BulkRoleTarget):
+    role_name: str
+
+
+class BulkRoleResult(BaseModel):
+    username: str
+    status: Literal['updated', 'not_found']
+    role: str | None = None
+
+
+class BulkRoleSummary(BaseModel):
+    """Totals of a bulk role change, the last line of its report."""
+    updated: int = 0
+    not_found: int = 0
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 from src.schemas.roles import RoleCRUD
@@ -26,3 +28,22 @@ class UserCreateOrUpdate(UserLogin):
 class UserWithRole(BaseModel):
     username: str
     role: RoleCRUD | None = None
+
+
+class UsernameAvailability(UserBase):
+    available: bool
+
+
+class UserImportResult(BaseModel):
+    """Result of a bulk import row."""
+    line: int
+    username: str | None = None
+    status: Literal['created', 'conflict', 'invalid']
+    detail: str | None = None
+
+
+class UserImportSummary(BaseModel):
+    """Totals of a bulk import, the last line of its report."""
+    created: int = 0
+    conflicts: int = 0
+    invalid: int = 0
@@ -3,6 +3,7 @@ from functools import lru_cache
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.core.tracing import traced_methods
 from src.models.user import User
 
 
@@ -10,6 +11,7 @@ class AccountDataException(ValueError):
     """Exception raised when new value for account is invalid"""
 
 
+@traced_methods
 class AccountService:
 
     async def query_user_by_id(self, db_session: AsyncSession, user_id: str):
@@ -31,12 +33,12 @@ class AccountService:
     async def change_password(self, db_session: AsyncSession, user_id: str, old_password: str, new_password: str):
         user = await self.query_user_by_id(db_session, user_id)
 
-        if not user.is_correct_password(old_password):
+        if not await user.verify_password(old_password):
             raise AccountDataException('Wrong password')
         if old_password == new_password:
             raise AccountDataException('New password must be different')
 
-        user.password = new_password
+        await user.set_password(new_password)
 
         await db_session.commit()
 
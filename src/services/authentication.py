@@ -1,11 +1,16 @@
+import time
 from functools import lru_cache
 
-from async_fastapi_jwt_auth import AuthJWT
 from fastapi import Depends, HTTPException, status
 from pydantic import BaseModel, Field, field_serializer
 from redis.asyncio import Redis
 
+from src.core.auth import AuthContext
+from src.core.config import settings
+from src.core.constants import REVOKED_TOKENS_STREAM
+from src.core.tracing import traced_methods
 from src.db.redis import get_redis
+from src.db.streams import follow_stream
 
 
 class RedisTokenModel(BaseModel):
@@ -19,47 +24,123 @@ class RedisTokenModel(BaseModel):
         return str(used)
 
 
+# Issue refresh token record, optionally only in exchange for the current one. Atomic, so concurrent
+# refreshes with the same token can't both pass the check.
+# KEYS[1]: token record ID. ARGV: JTI of the exchanged token ('' to skip the check), new JTI, new expiration time.
+ROTATE_REFRESH_TOKEN_SCRIPT = """
+if ARGV[1] ~= '' then
+    local record = redis.call('HMGET', KEYS[1], 'jti', 'used')
+    if record[1] ~= ARGV[1] or record[2] ~= 'False' then
+        return 0
+    end
+end
+redis.call('HSET', KEYS[1], 'jti', ARGV[2], 'expires_at', ARGV[3], 'used', 'False')
+redis.call('EXPIREAT', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class TokenDenylist:
+    """
+    Process-local set of revoked access token JTIs. Entries are evicted after the tokens expire.
+
+    Revocations are appended to a Redis stream, which every worker follows (see `follow`),
+    so checking a token needs no network I/O.
+    """
+
+    def __init__(self, redis: Redis, retention: int, sweep_interval: float):
+        """
+        :param redis: A Redis client.
+        :param retention: Lifetime of access tokens in seconds. Older stream entries are trimmed.
+        :param sweep_interval: Seconds between evictions of expired entries.
+        """
+        self.redis = redis
+        self.retention = retention
+        self.sweep_interval = sweep_interval
+        self._expires_at: dict[str, int] = {}
+        self._next_sweep = time.time() + sweep_interval
+
+    def __len__(self):
+        return len(self._expires_at)
+
+    def is_revoked(self, jti: str) -> bool:
+        return self._expires_at.get(jti, 0) > time.time()
+
+    def add(self, jti: str, expires_at: int):
+        self._expires_at[jti] = int(expires_at)
+
+        if (now := time.time()) >= self._next_sweep:
+            self._expires_at = {token_id: exp for token_id, exp in self._expires_at.items() if exp > now}
+            self._next_sweep = now + self.sweep_interval
+
+    async def revoke(self, jti: str, expires_at: int):
+        self.add(jti, expires_at)
+        # Entries older than the access token lifetime refer to expired tokens only.
+        min_id = int((time.time() - self.retention) * 1000)
+        await self.redis.xadd(REVOKED_TOKENS_STREAM, {'jti': jti, 'exp': expires_at}, minid=min_id, approximate=True)
+
+    def handle_entry(self, fields: dict):
+        self.add(fields['jti'], int(fields['exp']))
+
+    async def follow(self, block_ms: int):
+        """Apply revocations from all workers, starting with those still in the stream. Runs until cancelled."""
+        await follow_stream(self.redis, REVOKED_TOKENS_STREAM, self.handle_entry, block_ms=block_ms)
+
+
+@traced_methods
 class AuthenticationService:
-    def __init__(self, redis: Redis, auth_jwt: AuthJWT):
+    def __init__(self, redis: Redis, auth_jwt: AuthContext, denylist: TokenDenylist):
         self.redis = redis
         self.auth_jwt = auth_jwt
+        self.denylist = denylist
+        self._rotate_refresh_token = redis.register_script(ROTATE_REFRESH_TOKEN_SCRIPT)
 
     async def is_refresh_token_used(self) -> bool:
         """
         Check if current refresh token in the list of used tokens.
 
-        :return: True if token was already used or does not exist, else False
+        :return: True if token was already used, replaced by another token or does not exist, else False
         """
-        record_id = await self.auth_jwt.get_jwt_subject()
-        token_used = await self.redis.hget(name=record_id, key='used')
-        return not token_used == 'False'
+        raw_jwt = await self.auth_jwt.get_raw_jwt()
+        jti, token_used = await self.redis.hmget(name=raw_jwt['sub'], keys=['jti', 'used'])
+        return not (jti == raw_jwt['jti'] and token_used == 'False')
 
-    async def new_token_pair(self, subject: str, claims: dict | None = None):
-        """Create new access and refresh tokens. Write to cookies and Redis."""
-        await self._refresh_token_mark_as_used(subject)
+    async def new_token_pair(self, subject: str, claims: dict | None = None, replaced_jti: str | None = None):
+        """
+        Create new access and refresh tokens. Write to cookies and Redis in a single round trip.
 
+        :param subject: Subject of the tokens.
+        :param claims: Additional claims of the access token.
+        :param replaced_jti: JTI of the refresh token being exchanged. New tokens are issued only if it is
+            the current unused refresh token of the subject.
+        """
         claims = claims if claims else {}
         new_access_token = await self.auth_jwt.create_access_token(subject=subject, user_claims=claims)
         new_refresh_token = await self.auth_jwt.create_refresh_token(subject=subject)
 
+        token_model = RedisTokenModel(**self.auth_jwt.get_issued_claims(new_refresh_token))
+        rotated = await self._rotate_refresh_token(
+            keys=[token_model.record_id], args=[replaced_jti or '', token_model.jti, token_model.expires_at]
+        )
+        if not rotated:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Token was used or does not exist')
+
         await self.auth_jwt.set_access_cookies(new_access_token)
         await self.auth_jwt.set_refresh_cookies(new_refresh_token)
 
-        await self._save_refresh_token_to_redis(new_refresh_token)
+    async def refresh_token_pair(self, claims: dict | None = None):
+        """Exchange current refresh token for a new token pair. The current token becomes invalid."""
+        raw_jwt = await self.auth_jwt.get_raw_jwt()
+        await self.new_token_pair(subject=raw_jwt['sub'], claims=claims, replaced_jti=raw_jwt['jti'])
 
     async def logout(self):
-        """Mark refresh token as used in Redis. Remove tokens from cookies."""
+        """Mark refresh token as used in Redis, revoke access token. Remove tokens from cookies."""
         subject = await self.auth_jwt.get_jwt_subject()
         await self._refresh_token_mark_as_used(subject)
+        if access_claims := await self.auth_jwt.get_access_token_claims():
+            await self.denylist.revoke(access_claims['jti'], access_claims['exp'])
         await self.auth_jwt.unset_jwt_cookies()
 
-    async def _save_refresh_token_to_redis(self, encoded_token: str):
-        """Save refresh token to Redis."""
-        raw_jwt_token = await self.auth_jwt.get_raw_jwt(encoded_token)
-        token_model = RedisTokenModel(**raw_jwt_token)
-        await self.redis.hset(name=token_model.record_id, mapping=token_model.dict(exclude={'record_id'}))
-        await self.redis.expireat(name=token_model.record_id, when=token_model.expires_at)
-
     async def _refresh_token_mark_as_used(self, record_id: str):
         """
         Change refresh token 'used' status in redis storage to True.
@@ -67,10 +148,16 @@ class AuthenticationService:
         """
         await self.redis.hset(name=record_id, key='used', value='True')
 
-    async def jwt_refresh_token_required(self):
+    async def jwt_refresh_token_required(self, check_used: bool = True):
+        """
+        Require valid refresh token.
+
+        :param check_used: Check the token in Redis. Skip it, if the token is exchanged with `refresh_token_pair`,
+            which checks the token atomically.
+        """
         await self.auth_jwt.jwt_refresh_token_required()
 
-        if await self.is_refresh_token_used():
+        if check_used and await self.is_refresh_token_used():
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Token was used or does not exist')
 
     async def get_jwt_subject(self):
@@ -81,5 +168,10 @@ class AuthenticationService:
 
 
 @lru_cache
-def get_authentication_service(redis: Redis = Depends(get_redis), auth_jwt: AuthJWT = Depends(AuthJWT)):
-    return AuthenticationService(redis, auth_jwt)
+def get_token_denylist(redis: Redis = Depends(get_redis)) -> TokenDenylist:
+    return TokenDenylist(redis, settings.auth.authjwt_access_token_expires, settings.cache.denylist_sweep_interval)
+
+
+@lru_cache
+def get_authentication_service(redis: Redis = Depends(get_redis), auth_jwt: AuthContext = Depends(AuthContext)):
+    return AuthenticationService(redis, auth_jwt, get_token_denylist(redis=redis))
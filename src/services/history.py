@@ -1,32 +1,129 @@
+import asyncio
+import logging
 import uuid
+from datetime import datetime, timezone
 from functools import lru_cache
 
-from sqlalchemy import desc, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from src.core.tracing import traced_methods
 from src.models.history import LoginHistory
 from src.schemas.requests import PageParams
 from src.schemas.responses import PagedResponseSchema
-from src.utils.paginate import paginate_statement
+from src.utils.paginate import CachedCount, ExactCount, paginate_by_cursor, paginate_statement
 
+logger = logging.getLogger(__name__)
 
+_STOP = object()
+
+
+class LoginHistoryWriter:
+    """
+    Write-behind buffer for login history.
+
+    Events are queued in process and inserted by a background task with one multi-row INSERT
+    per `batch_size` events or per `flush_interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, batch_size: int, flush_interval: float, queue_size: int):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.flushed = 0
+        self.dropped = 0
+        self._task: asyncio.Task | None = None
+
+    def stats(self) -> dict:
+        return {'queued': self.queue.qsize(), 'flushed': self.flushed, 'dropped': self.dropped}
+
+    def put(self, user_id: uuid) -> bool:
+        """Queue login event. Event is dropped if the queue is full."""
+        event = {'id': uuid.uuid4(), 'user_id': user_id, 'login_time': datetime.now(timezone.utc).replace(tzinfo=None)}
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning('Login history queue is full, event of user %s dropped', user_id)
+            return False
+        return True
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush all queued events and stop the background task."""
+        if self._task is None:
+            return
+        await self.queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if (event := await self.queue.get()) is _STOP:
+                return
+
+            batch = [event]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size and (timeout := deadline - loop.time()) > 0:
+                try:
+                    event = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if event is _STOP:
+                    await self._flush(batch)
+                    return
+                batch.append(event)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]):
+        try:
+            async with self.session_factory() as session:
+                await session.execute(insert(LoginHistory).values(batch))
+                await session.commit()
+        except Exception:
+            self.dropped += len(batch)
+            logger.exception('Failed to write %s login history events', len(batch))
+        else:
+            self.flushed += len(batch)
+
+
+@traced_methods
 class HistoryService:
+    def __init__(self):
+        self.writer: LoginHistoryWriter | None = None
+
     async def create(self, session: AsyncSession, user_id: uuid):
+        if self.writer:
+            self.writer.put(user_id)
+            return
+
         history = LoginHistory(user_id=user_id)
         session.add(history)
         await session.commit()
         await session.refresh(history)
 
     async def get_history_paginated(
-        self, session: AsyncSession, user_id: uuid, page_params: PageParams
-    ) -> (PagedResponseSchema, int):
+        self, session: AsyncSession, user_id: uuid, page_params: PageParams, counter: ExactCount | CachedCount | None = None
+    ) -> (PagedResponseSchema, int, bool):
         stmt = (
             select(LoginHistory)
             .where(LoginHistory.user_id == user_id)  # noqa
             .order_by(desc(LoginHistory.login_time)))   # noqa
 
-        paginated_stmt, pages_count = await paginate_statement(session, stmt, page_params)
-        return (await session.scalars(paginated_stmt)).all(), pages_count
+        paginated_stmt, pages_count, estimated = await paginate_statement(session, stmt, page_params, counter)
+        return (await session.scalars(paginated_stmt)).all(), pages_count, estimated
+
+    async def get_history_by_cursor(
+        self, session: AsyncSession, user_id: uuid, cursor: str | None, size: int
+    ) -> (list[LoginHistory], str | None):
+        stmt = select(LoginHistory).where(LoginHistory.user_id == user_id)  # noqa
+
+        return await paginate_by_cursor(session, stmt, (LoginHistory.login_time, LoginHistory.id), cursor, size)
 
 
 @lru_cache
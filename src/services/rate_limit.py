@@ -0,0 +1,138 @@
+import logging
+import math
+import time
+from functools import lru_cache
+from uuid import uuid4
+
+from fastapi import Depends, HTTPException, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.core.config import RateLimitSettings, RouteRateLimit, settings
+from src.db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Sliding window log: a sorted set of request timestamps per key. Request is counted in all windows or in none.
+# Server time is used, so windows are consistent across workers.
+# KEYS: counters. ARGV: window in ms, unique request ID, limit of each key.
+# Returns 0 if request is allowed, else milliseconds until a slot is freed.
+SLIDING_WINDOW_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local window = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= tonumber(ARGV[i + 2]) then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        return math.max(tonumber(oldest[2]) + window - now, 1)
+    end
+end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[2])
+    redis.call('PEXPIRE', key, window)
+end
+return 0
+"""
+
+
+class LocalRateLimiter:
+    """
+    Process-local token buckets. Rejects clients exceeding `rate` requests per second after a burst of `capacity`
+    requests, without a round trip to Redis.
+    """
+
+    def __init__(self, capacity: int, rate: float, max_clients: int):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_clients = max_clients
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def acquire(self, key: str) -> float:
+        """
+        Take a token from the bucket of the key.
+
+        :return: 0 if the token was taken, else seconds until the next token.
+        """
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+        if key not in self._buckets and len(self._buckets) >= self.max_clients:
+            self._evict_full(now)
+        self._buckets[key] = (tokens - 1, now)
+        return 0
+
+    def _evict_full(self, now: float):
+        """Drop buckets refilled up to capacity: they are equal to new ones. Drop all, if none is full."""
+        self._buckets = {
+            key: (tokens, updated_at)
+            for key, (tokens, updated_at) in self._buckets.items()
+            if tokens + (now - updated_at) * self.rate < self.capacity
+        }
+        if len(self._buckets) >= self.max_clients:
+            self._buckets.clear()
+
+
+class RateLimiter:
+    def __init__(self, redis: Redis, config: RateLimitSettings):
+        self.redis = redis
+        self.config = config
+        self.local = LocalRateLimiter(config.local_burst, config.local_rate, config.local_max_clients)
+        self._sliding_window = redis.register_script(SLIDING_WINDOW_SCRIPT)
+
+    async def check(self, route: str, client_ip: str, username: str | None = None):
+        """
+        Count request to the route. Raise HTTPException 429 with Retry-After header if a limit is exceeded.
+
+        Requests are allowed if Redis is unavailable.
+
+        :param route: Route name, key of `RateLimitSettings.routes`.
+        :param client_ip: Client IP address.
+        :param username: Username from the request, if any.
+        """
+        if not self.config.enabled or not (limits := self.config.routes.get(route)):
+            return
+
+        if retry_after := self.local.acquire(f'{route}:{client_ip}'):
+            self._reject(retry_after)
+
+        keys, args = self._counters(route, limits, client_ip, username)
+        if not keys:
+            return
+        try:
+            retry_after_ms = await self._sliding_window(keys=keys, args=[limits.window * 1000, uuid4().hex, *args])
+        except RedisError as exc:
+            logger.warning('Rate limit of %s was not checked: %s', route, exc)
+            return
+        if retry_after_ms:
+            self._reject(retry_after_ms / 1000)
+
+    @staticmethod
+    def _counters(route: str, limits: RouteRateLimit, client_ip: str, username: str | None) -> (list[str], list[int]):
+        # Hash tag keeps keys of a route in one cluster slot, as the script uses several keys.
+        keys, args = [], []
+        if limits.ip:
+            keys.append(f'ratelimit:{{{route}}}:ip:{client_ip}')
+            args.append(limits.ip)
+        if limits.username and username:
+            keys.append(f'ratelimit:{{{route}}}:username:{username}')
+            args.append(limits.username)
+        return keys, args
+
+    @staticmethod
+    def _reject(retry_after: float):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail='Too many requests',
+            headers={'Retry-After': str(math.ceil(retry_after))},
+        )
+
+
+@lru_cache
+def get_rate_limiter(redis: Redis = Depends(get_redis)) -> RateLimiter:
+    return RateLimiter(redis, settings.rate_limit)
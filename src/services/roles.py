@@ -1,25 +1,183 @@
+import logging
+import time
 from functools import lru_cache
 from uuid import UUID
 
-from sqlalchemy import select
+from fastapi import Depends
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import ARRAY, String, any_, bindparam, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
-from src.core.constants import DEFAULT_ROLE_DATA
+from src.core.config import settings
+from src.core.constants import CLAIMS_VERSION_CHANNEL, CLAIMS_VERSIONS_KEY, DEFAULT_ROLE_DATA, ROLES_INVALIDATION_CHANNEL
+from src.core.tracing import traced_methods
+from src.db.redis import get_redis
 from src.models import User
 from src.models.roles import Role
+from src.schemas.roles import RoleDB
 
+logger = logging.getLogger(__name__)
 
+# Set the version of users to the server time in microseconds and drop versions older than the TTL.
+# KEYS: versions sorted set. ARGV: TTL in microseconds, user IDs. Returns the version.
+# Server time in microseconds, on the node of the versions key, so that it is comparable with the versions.
+# KEYS: versions sorted set.
+SERVER_TIME_SCRIPT = """
+local time = redis.call('TIME')
+return tonumber(time[1]) * 1000000 + tonumber(time[2])
+"""
+
+BUMP_CLAIMS_VERSIONS_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+local ttl = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - ttl)
+for i = 2, #ARGV do
+    redis.call('ZADD', KEYS[1], now, ARGV[i])
+end
+redis.call('PEXPIRE', KEYS[1], math.ceil(ttl / 1000))
+return now
+"""
+
+
+class RoleCache:
+    """Process-local cache of roles, keyed by id and by name. Entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: dict[tuple[str, str], tuple[float, RoleDB]] = {}
+
+    def get(self, key: str, value) -> RoleDB | None:
+        if not (entry := self._entries.get((key, str(value)))):
+            return None
+
+        expires_at, role = entry
+        if expires_at < time.monotonic():
+            self._entries.pop((key, str(value)), None)
+            return None
+        return role
+
+    def put(self, role: Role):
+        entry = (time.monotonic() + self.ttl, RoleDB.model_validate(role))
+        self._entries[('id', str(role.id))] = entry
+        self._entries[('name', role.name)] = entry
+
+    def clear(self, _: str | None = None):
+        self._entries.clear()
+
+
+class ClaimsVersions:
+    """
+    Per-user version of access token claims, bumped when the claims change.
+
+    A version is the Redis server time of the bump in microseconds, and a token carries the server time of its issue:
+    the token is current if it was issued after the last bump. Versions are stored in a Redis sorted set and mirrored
+    in process memory, so checking a token needs no network I/O. Other workers update their mirrors from messages
+    published on every bump.
+
+    Versions older than `ttl`, the access token lifetime, are dropped: tokens issued before such a bump have expired,
+    and tokens issued after it are current whether the version is still known or not.
+    """
+
+    def __init__(self, redis: Redis, ttl: float):
+        self.redis = redis
+        self.ttl = ttl
+        self._versions: dict[str, int] = {}
+        self._latest = 0
+        self._pruned_at = 0
+        self._bump = redis.register_script(BUMP_CLAIMS_VERSIONS_SCRIPT)
+        self._server_time = redis.register_script(SERVER_TIME_SCRIPT)
+
+    def is_current(self, user_id: str, version: int) -> bool:
+        return version >= self._versions.get(user_id, 0)
+
+    async def issue(self) -> int:
+        """Return the version to put in a token issued now."""
+        return await self._server_time(keys=[CLAIMS_VERSIONS_KEY])
+
+    async def bump(self, user_id: UUID | str) -> int:
+        await self.bump_many([user_id])
+        return self._versions[str(user_id)]
+
+    async def bump_many(self, user_ids: list[UUID | str], chunk_size: int = 1000):
+        """Bump versions of many users: a script call and a single message per chunk."""
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = [str(user_id) for user_id in user_ids[start:start + chunk_size]]
+            version = await self._bump(keys=[CLAIMS_VERSIONS_KEY], args=[int(self.ttl * 1_000_000), *chunk])
+            versions = dict.fromkeys(chunk, version)
+
+            for user_id in chunk:
+                self._update(user_id, version)
+            await self._publish(versions)
+
+    async def handle_message(self, data: str | None):
+        """
+        Apply published versions, comma-separated `user_id:version` pairs.
+        Reload all versions after (re)subscription, as messages could be missed.
+        """
+        if data is None:
+            versions = await self.redis.zrange(CLAIMS_VERSIONS_KEY, 0, -1, withscores=True)
+            self._versions = {}
+            for user_id, version in versions:
+                self._update(user_id, int(version))
+            return
+
+        for item in data.split(','):
+            user_id, version = item.rsplit(':', 1)
+            self._update(user_id, int(version))
+
+    async def _publish(self, versions: dict[str, int]):
+        try:
+            await self.redis.publish(
+                CLAIMS_VERSION_CHANNEL, ','.join(f'{user_id}:{version}' for user_id, version in versions.items())
+            )
+        except RedisError as exc:
+            logger.warning('Claims versions of %s users were not published: %s', len(versions), exc)
+
+    def _update(self, user_id: str, version: int):
+        if version > self._versions.get(user_id, 0):
+            self._versions[user_id] = version
+        if version > self._latest:
+            self._latest = version
+            self._prune()
+
+    def _prune(self):
+        """Drop mirrored versions older than `ttl`, at most once per `ttl`. Compared with the latest server time seen."""
+        ttl = int(self.ttl * 1_000_000)
+        if self._latest - self._pruned_at < ttl:
+            return
+        self._pruned_at = self._latest
+        self._versions = {
+            user_id: version for user_id, version in self._versions.items() if version > self._latest - ttl
+        }
+
+
+@traced_methods
 class RoleService:
+    def __init__(self, redis: Redis, cache_ttl: float, claims_ttl: float):
+        self.redis = redis
+        self.cache = RoleCache(cache_ttl)
+        self.claims_versions = ClaimsVersions(redis, claims_ttl)
+
     async def get(self, session: AsyncSession, role_id: UUID) -> Role | None:
-        return (await session.scalars(select(Role).where(Role.id == role_id))).first()  # noqa
+        if cached_role := self.cache.get('id', role_id):
+            return await self._attach(session, cached_role)
+
+        return self._cache((await session.scalars(select(Role).where(Role.id == role_id))).first())  # noqa
 
     async def get_by_name(self, session: AsyncSession, role_name: str) -> Role | None:
-        return (await session.scalars(select(Role).where(Role.name == role_name))).first()  # noqa
+        if cached_role := self.cache.get('name', role_name):
+            return await self._attach(session, cached_role)
+
+        return self._cache((await session.scalars(select(Role).where(Role.name == role_name))).first())  # noqa
 
     async def create(self, session: AsyncSession, role_data: dict) -> Role:
         new_role = Role(**role_data)
         session.add(new_role)
         await session.commit()
+        await self.invalidate_cache()
 
         return new_role
 
@@ -27,6 +185,7 @@ class RoleService:
         for key, value in update_data.items():
             setattr(role, key, value)
         await session.commit()
+        await self.invalidate_cache()
         await session.refresh(role)
 
         return role
@@ -34,6 +193,7 @@ class RoleService:
     async def delete(self, session: AsyncSession, role: Role) -> Role:
         await session.delete(role)
         await session.commit()
+        await self.invalidate_cache()
         return role
 
     async def elements(self, session: AsyncSession):
@@ -42,17 +202,63 @@ class RoleService:
     async def assign_role(self, session: AsyncSession, role: Role, user: User) -> User:
         user.role = role
         await session.commit()
+        await self.claims_versions.bump(user.id)
         await session.refresh(user)
 
         return user
 
+    async def assign_role_bulk(
+            self, session: AsyncSession, role: Role, usernames: list[str] | None = None, with_role: Role | None = None
+    ) -> list[tuple[UUID, str]]:
+        """
+        Assign the role to the users by usernames or to all users with another role, in a single UPDATE.
+
+        :return: Ids and usernames of the updated users.
+        """
+        stmt = update(User).values(role_id=role.id).returning(User.id, User.username)
+        if usernames is not None:
+            # One array parameter instead of a parameter per username, which would hit the limit of 32767.
+            stmt = stmt.where(User.username == any_(bindparam('usernames', usernames, type_=ARRAY(String))))
+        else:
+            stmt = stmt.where(User.role_id == with_role.id, User.role_id != role.id)
+
+        updated = (await session.execute(stmt, execution_options={'synchronize_session': False})).all()
+        await session.commit()
+        await self.claims_versions.bump_many([user_id for user_id, _ in updated])
+
+        return updated
+
+    async def get_token_claims(self, user: User) -> dict:
+        """Return access token claims of the user. User must be loaded with the role."""
+        return {'access_level': user.role.access_level, 'cv': await self.claims_versions.issue()}
+
     async def get_default_role(self, session: AsyncSession) -> Role:
         if not (default_role := await self.get_by_name(session, DEFAULT_ROLE_DATA['name'])):
             default_role = await self.create(session, DEFAULT_ROLE_DATA)
 
         return default_role
 
+    async def invalidate_cache(self):
+        """Drop cached roles in this process and notify other workers through Redis."""
+        self.cache.clear()
+        try:
+            await self.redis.publish(ROLES_INVALIDATION_CHANNEL, 'all')
+        except RedisError as exc:
+            logger.warning('Roles cache invalidation was not published: %s', exc)
+
+    def _cache(self, role: Role | None) -> Role | None:
+        if role:
+            self.cache.put(role)
+        return role
+
+    @staticmethod
+    async def _attach(session: AsyncSession, cached_role: RoleDB) -> Role:
+        """Return Role instance bound to the session, built from cached data without a SELECT."""
+        role = Role(**cached_role.model_dump())
+        make_transient_to_detached(role)
+        return await session.merge(role, load=False)
+
 
 @lru_cache
-def get_role_service() -> RoleService:
-    return RoleService()
+def get_role_service(redis: Redis = Depends(get_redis)) -> RoleService:
+    return RoleService(redis, settings.cache.roles_ttl, settings.auth.authjwt_access_token_expires)
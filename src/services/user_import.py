@@ -0,0 +1,191 @@
+"""
+Bulk import of users from NDJSON or CSV.
+
+Rows are processed in batches, each in its own transaction:
+existing usernames are found with a single SELECT, passwords are hashed concurrently in the hashing pool, a few at a time,
+and new users are loaded with COPY into a temporary table, then inserted skipping usernames registered meanwhile.
+A conflicting or invalid row is reported and skipped, the rest of the batch is imported.
+"""
+import asyncio
+import csv
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Iterator, Literal
+from uuid import UUID, uuid4
+
+import orjson
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.constants import DEFAULT_ROLE_DATA
+from src.core.hashing import PasswordHasher
+from src.models import Role, User
+from src.schemas.user import UserImportResult, UserImportSummary
+from src.services.username_filter import UsernameFilter
+
+ImportFormat = Literal['ndjson', 'csv']
+
+USERNAME_MAX_LENGTH = User.__table__.c.username.type.length
+COPY_COLUMNS = ['id', 'username', 'password_hash', 'role_id']
+
+
+@dataclass
+class ImportRow:
+    line: int
+    username: str | None = None
+    password: str | None = None
+    role: str | None = None
+    error: str | None = None
+
+
+def parse_rows(lines: Iterable[str], import_format: ImportFormat) -> Iterator[ImportRow]:
+    """
+    Parse NDJSON objects or CSV with a header. Fields: username, password, role (optional, default role).
+
+    Unparsable lines and rows with non-string fields are returned as rows with an error.
+    """
+    if import_format == 'csv':
+        reader = csv.DictReader(lines, skipinitialspace=True)
+        for data in reader:
+            yield _make_row(reader.line_num, data)
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield ImportRow(line_number, error='Invalid JSON')
+            continue
+        if not isinstance(data, dict):
+            yield ImportRow(line_number, error='Row must be an object')
+            continue
+        yield _make_row(line_number, data)
+
+
+def _make_row(line: int, data: dict) -> ImportRow:
+    username, password, role = data.get('username'), data.get('password'), data.get('role')
+    if not all(value is None or isinstance(value, str) for value in (username, password, role)):
+        return ImportRow(
+            line, username if isinstance(username, str) else None, error='Username, password and role must be strings'
+        )
+    return ImportRow(line, username, password, role or None)
+
+
+class UserImporter:
+    def __init__(
+            self, session: AsyncSession, hasher: PasswordHasher, batch_size: int = 1000,
+            username_filter: UsernameFilter | None = None, hash_concurrency: int | None = None):
+        """
+        :param hash_concurrency: Max passwords hashed at once, by default the size of the hasher pool.
+            With a pool shared with request handlers, keep it below the pool size, so that logins don't queue
+            behind the whole batch.
+        """
+        self.session = session
+        self.hasher = hasher
+        self.batch_size = batch_size
+        self.username_filter = username_filter
+        self._hash_slots = asyncio.Semaphore(hash_concurrency or hasher.max_workers)
+
+    async def run(self, rows: Iterable[ImportRow]) -> AsyncIterator[UserImportResult | UserImportSummary]:
+        """Import rows. Yield result of each row, ordered by line within a batch, then totals."""
+        roles = dict((await self.session.execute(select(Role.name, Role.id))).all())
+        summary = UserImportSummary()
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) < self.batch_size:
+                continue
+            for result in await self._import_batch(batch, roles):
+                self._count(summary, result)
+                yield result
+            batch = []
+
+        if batch:
+            for result in await self._import_batch(batch, roles):
+                self._count(summary, result)
+                yield result
+        yield summary
+
+    async def _import_batch(self, batch: list[ImportRow], roles: dict[str, UUID]) -> list[UserImportResult]:
+        results = []
+        created = set()
+        candidates: dict[str, ImportRow] = {}
+        for row in batch:
+            if error := row.error or self._validate(row, roles):
+                results.append(UserImportResult(line=row.line, username=row.username, status='invalid', detail=error))
+            elif row.username in candidates:
+                results.append(self._conflict(row, 'Duplicate username in the file'))
+            else:
+                candidates[row.username] = row
+
+        if candidates:
+            stmt = select(User.username).where(User.username.in_(list(candidates)))
+            for username in (await self.session.scalars(stmt)).all():
+                results.append(self._conflict(candidates.pop(username), 'Username already registered'))
+
+        if candidates:
+            password_hashes = await asyncio.gather(*(self._hash(row.password) for row in candidates.values()))
+            records = [
+                (uuid4(), row.username, password_hash, roles[row.role or DEFAULT_ROLE_DATA['name']])
+                for row, password_hash in zip(candidates.values(), password_hashes)
+            ]
+            created = await self._copy(records)
+            for row in candidates.values():
+                if row.username in created:
+                    results.append(UserImportResult(line=row.line, username=row.username, status='created'))
+                else:
+                    results.append(self._conflict(row, 'Username already registered'))
+
+        await self.session.commit()
+        if self.username_filter:
+            await self.username_filter.add(*created)
+        return sorted(results, key=lambda result: result.line)
+
+    async def _hash(self, password: str) -> str:
+        async with self._hash_slots:
+            return await self.hasher.hash(password)
+
+    async def _copy(self, records: list[tuple]) -> set[str]:
+        """Load users with COPY, insert those with free usernames. Return usernames of inserted users."""
+        connection = await self.session.connection()
+        await connection.execute(text('CREATE TEMPORARY TABLE user_import (LIKE "user") ON COMMIT DROP'))
+
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table('user_import', records=records, columns=COPY_COLUMNS)
+
+        columns = ', '.join(COPY_COLUMNS)
+        inserted = await connection.scalars(text(
+            f'INSERT INTO "user" ({columns}) SELECT {columns} FROM user_import '
+            'ON CONFLICT (username) DO NOTHING RETURNING username'
+        ))
+        return set(inserted.all())
+
+    @staticmethod
+    def _validate(row: ImportRow, roles: dict[str, UUID]) -> str | None:
+        """Return error of the row. Same rules as for a registered user."""
+        if not isinstance(row.username, str) or not isinstance(row.password, str):
+            return 'Username and password are required'
+        if not 3 < len(row.username) <= USERNAME_MAX_LENGTH:
+            return f'Username length must be > 3 and <= {USERNAME_MAX_LENGTH}'
+        if len(row.password) < 8:
+            return 'Password length must be > 7'
+        if row.password == row.username:
+            return 'Password cannot be same as Username'
+        if (row.role or DEFAULT_ROLE_DATA['name']) not in roles:
+            return f'Role {row.role or DEFAULT_ROLE_DATA["name"]} does not exist'
+        return None
+
+    @staticmethod
+    def _conflict(row: ImportRow, detail: str) -> UserImportResult:
+        return UserImportResult(line=row.line, username=row.username, status='conflict', detail=detail)
+
+    @staticmethod
+    def _count(summary: UserImportSummary, result: UserImportResult):
+        if result.status == 'created':
+            summary.created += 1
+        elif result.status == 'conflict':
+            summary.conflicts += 1
+        else:
+            summary.invalid += 1
@@ -0,0 +1,141 @@
+"""
+Bloom filter of registered usernames in a Redis bitmap, shared by all workers.
+
+A miss means the username is definitely not registered: login with an unknown username and availability checks
+need no database query. A hit may be false (at `error_rate`) or stale after a rename, and is confirmed by a query.
+
+The bit after the filter bits marks the filter as built, so an evicted bitmap is never read as empty.
+Until the filter is built from the database, every username is a possible hit.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+from contextlib import suppress
+from functools import lru_cache
+
+from fastapi import Depends
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.config import UsernameFilterSettings, settings
+from src.core.constants import USERNAME_FILTER_KEY
+from src.db.redis import get_redis
+from src.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class UsernameFilter:
+    def __init__(self, redis: Redis, config: UsernameFilterSettings):
+        self.redis = redis
+        self.enabled = config.enabled
+        self.size = math.ceil(-config.capacity * math.log(config.error_rate) / math.log(2) ** 2)
+        self.hash_count = max(round(self.size / config.capacity * math.log(2)), 1)
+        # Sizing is a part of the key: a filter of other size is built anew instead of being misread.
+        self.key = f'{USERNAME_FILTER_KEY}:{self.size}:{self.hash_count}'
+        self.ready_offset = self.size
+        self.lock_key = f'{self.key}:lock'
+        self._missed: set[str] = set()
+        self._rebuild = asyncio.Event()
+
+    async def might_contain(self, username: str) -> bool:
+        """Return False if the username is definitely not registered. Redis errors count as a possible hit."""
+        if not self.enabled:
+            return True
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.getbit(self.key, self.ready_offset)
+                for offset in self._offsets(username):
+                    pipe.getbit(self.key, offset)
+                ready, *bits = await pipe.execute()
+        except RedisError as exc:
+            logger.warning('Username filter was not checked: %s', exc)
+            return True
+        return not ready or all(bits)
+
+    async def add(self, *usernames: str):
+        """
+        Add registered usernames.
+
+        If Redis fails, the filter is disabled until it is rebuilt by `keep_built`: a missed username would be
+        reported as not registered.
+        """
+        if not self.enabled or not usernames:
+            return
+        try:
+            await self._set_bits(usernames)
+        except RedisError as exc:
+            logger.warning('Usernames were not added to the filter, disabling it: %s', exc)
+            self._missed.update(usernames)
+            self._rebuild.set()
+            with suppress(RedisError):
+                await self.redis.setbit(self.key, self.ready_offset, 0)
+
+    async def keep_built(self, session_factory: async_sessionmaker, check_interval: float):
+        """
+        Build the filter, then rebuild it when it is disabled by a failed `add`, evicted or disabled by another process.
+
+        :param session_factory: Factory of database sessions.
+        :param check_interval: Seconds between checks of the ready bit, and between retries while Redis is unavailable.
+        """
+        if not self.enabled:
+            return
+        while True:
+            try:
+                if self._missed:
+                    await self._set_bits(missed := list(self._missed))
+                    self._missed.difference_update(missed)
+                async with session_factory() as session:
+                    await self.build(session)
+            except RedisError as exc:
+                logger.warning('Username filter was not rebuilt: %s', exc)
+
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._rebuild.wait(), check_interval)
+            self._rebuild.clear()
+
+    async def build(self, session: AsyncSession, chunk_size: int = 10000, lock_timeout: int = 600):
+        """Add all registered usernames, then enable the filter. Skipped if built, or being built by another worker."""
+        if not self.enabled:
+            return
+        try:
+            if await self.redis.getbit(self.key, self.ready_offset):
+                return
+            if not await self.redis.set(self.lock_key, 1, nx=True, ex=lock_timeout):
+                return
+        except RedisError as exc:
+            logger.warning('Username filter was not built: %s', exc)
+            return
+
+        try:
+            # Usernames registered meanwhile are added by `add`, bits are never cleared.
+            stmt = select(User.username).execution_options(yield_per=chunk_size)
+            async for usernames in (await session.stream_scalars(stmt)).partitions():
+                await self._set_bits(usernames)
+            await self.redis.setbit(self.key, self.ready_offset, 1)
+        except RedisError as exc:
+            logger.warning('Username filter was not built: %s', exc)
+        finally:
+            with suppress(RedisError):
+                await self.redis.delete(self.lock_key)
+
+    async def _set_bits(self, usernames):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for username in usernames:
+                for offset in self._offsets(username):
+                    pipe.setbit(self.key, offset, 1)
+            await pipe.execute()
+
+    def _offsets(self, username: str) -> list[int]:
+        """Bit offsets of the username: double hashing of a single digest."""
+        digest = hashlib.blake2b(username.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+
+@lru_cache
+def get_username_filter(redis: Redis = Depends(get_redis)) -> UsernameFilter:
+    return UsernameFilter(redis, settings.username_filter)
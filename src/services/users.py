@@ -2,37 +2,83 @@ from functools import lru_cache
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import Select, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
+from src.core.constants import DEFAULT_ROLE_DATA
+from src.core.tracing import traced_methods
 from src.models import Role
 from src.models.user import User
 
 
+@traced_methods
 class UserService:
-    async def get_by_name(self, session: AsyncSession, username: str):
-        return (await session.scalars(select(User).where(User.username == username))).first()  # noqa
+    @staticmethod
+    def _select_user(load_role: bool = False) -> Select:
+        """
+        Base SELECT for User.
 
-    async def get(self, session: AsyncSession, user_id: UUID):
-        return (await session.scalars(select(User).where(User.id == user_id))).first()  # noqa
+        :param load_role: Fetch the user's Role in the same query (JOIN), instead of a separate lazy SELECT.
+        """
+        stmt = select(User)
+        if load_role:
+            stmt = stmt.options(joinedload(User.role))
+        return stmt
 
-    async def create(self, username: str, password: str, session: AsyncSession, role) -> User:
-        if await self.get_by_name(session, username):
-            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Username already registered')
+    async def get_by_name(self, session: AsyncSession, username: str, load_role: bool = False):
+        return (await session.scalars(self._select_user(load_role).where(User.username == username))).first()  # noqa
+
+    async def get(self, session: AsyncSession, user_id: UUID, load_role: bool = False):
+        return (await session.scalars(self._select_user(load_role).where(User.id == user_id))).first()  # noqa
+
+    async def create(self, username: str, password: str, session: AsyncSession) -> User:
+        """
+        Register user with the default role by a single INSERT. Taken username is detected by the unique index,
+        not by a prior SELECT, so concurrent registrations of the same username can't slip through.
+        The default role is looked up by a subquery of the INSERT, and created if it is missing.
+        """
+        new_user = User(username=username)
+        await new_user.set_password(password)
 
-        new_user = User(username=username, password=password, role=role)
-        session.add(new_user)
+        stmt = (
+            insert(User)
+            .values(
+                username=new_user.username,
+                password_hash=new_user.password_hash,
+                role_id=select(Role.id).where(Role.name == DEFAULT_ROLE_DATA['name']).scalar_subquery(),
+            )
+            .on_conflict_do_nothing(index_elements=[User.username])
+            .returning(User)
+        )
+        try:
+            created_user = (await session.scalars(stmt)).first()
+        except IntegrityError:
+            # No default role: the subquery yields NULL role_id.
+            await session.rollback()
+            await session.execute(insert(Role).values(**DEFAULT_ROLE_DATA).on_conflict_do_nothing(index_elements=[Role.name]))
+            created_user = (await session.scalars(stmt)).first()
+
+        if not created_user:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Username already registered')
         await session.commit()
 
-        return new_user
+        return created_user
 
     async def verify(self, username: str, password: str, session: AsyncSession):
-        if not (user := await self.get_by_name(session, username)):
+        if not (user := await self.get_by_name(session, username, load_role=True)):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Username is not registered')
 
-        if not user.is_correct_password(password):
+        if not await user.verify_and_update_password(password):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Wrong password')
 
+        if user in session.dirty:
+            # Hash was made with outdated parameters: store the new one, so that tuning rolls out on logins.
+            await session.commit()
+
         return user
 
 
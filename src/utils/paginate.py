@@ -1,33 +1,171 @@
-from typing import TypeVar
+import hashlib
+import json
+import logging
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import NamedTuple, Sequence, TypeVar
 
-from sqlalchemy import Select, func
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import Select, desc, func, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
 
 from src.schemas.requests import PageParams
 from src.schemas.responses import PagedResponseSchema
 
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
+
+class RecordsCount(NamedTuple):
+    value: int
+    estimated: bool = False
+
 
 async def count_records(session: AsyncSession, stmt: Select) -> int:
     """Return count of records matches to statement."""
-    count_stmt = stmt.with_only_columns(func.count()).order_by(None)
+    count_stmt = stmt.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)
     return (await session.scalars(count_stmt)).first()
 
 
-async def paginate_statement(session: AsyncSession, stmt: Select, page_params: PageParams) -> (PagedResponseSchema[T], int):
+class ExactCount:
+    """Count records with COUNT(*) on every call."""
+
+    async def count(self, session: AsyncSession, stmt: Select) -> RecordsCount:
+        return RecordsCount(await count_records(session, stmt))
+
+
+class CachedCount:
+    """
+    Exact count, cached in Redis for a short time per statement and scope.
+
+    A cached count misses records added since it was cached, so it is returned as an estimate.
+
+    :param redis: A Redis client.
+    :param ttl: Seconds to keep the count.
+    :param scope: Part of the cache key, e.g. ID of the user whose records are counted.
+    """
+
+    def __init__(self, redis: Redis, ttl: int, scope: str = ''):
+        self.redis = redis
+        self.ttl = ttl
+        self.scope = scope
+
+    def cache_key(self, stmt: Select) -> str:
+        compiled = stmt.compile()
+        digest = hashlib.sha1(f'{compiled}{sorted(compiled.params.items())}'.encode()).hexdigest()
+        return f'count:{self.scope}:{digest}'
+
+    async def count(self, session: AsyncSession, stmt: Select) -> RecordsCount:
+        key = self.cache_key(stmt)
+        try:
+            if (cached := await self.redis.get(key)) is not None:
+                return RecordsCount(int(cached), estimated=True)
+        except RedisError as exc:
+            logger.warning('Cached count is unavailable: %s', exc)
+            return RecordsCount(await count_records(session, stmt))
+
+        value = await count_records(session, stmt)
+        try:
+            await self.redis.set(key, value, ex=self.ttl)
+        except RedisError as exc:
+            logger.warning('Count was not cached: %s', exc)
+        return RecordsCount(value)
+
+
+class ApproximateCount:
+    """
+    Estimate count from planner statistics (pg_class.reltuples), without scanning the table.
+
+    Valid only for statements selecting all rows of a single table, e.g. unfiltered admin listings.
+    Falls back to exact count if the table was never analyzed.
+    """
+
+    async def count(self, session: AsyncSession, stmt: Select) -> RecordsCount:
+        if stmt.whereclause is not None or len(froms := stmt.get_final_froms()) != 1:
+            raise ValueError('Approximate count is available only for unfiltered statements over a single table')
+
+        reltuples_stmt = text('SELECT reltuples FROM pg_class WHERE oid = to_regclass(:table_name)')
+        reltuples = (await session.execute(reltuples_stmt, {'table_name': froms[0].name})).scalar()
+        if reltuples is None or reltuples < 0:
+            return RecordsCount(await count_records(session, stmt))
+        return RecordsCount(int(reltuples), estimated=True)
+
+
+async def paginate_statement(
+    session: AsyncSession, stmt: Select, page_params: PageParams, counter: ExactCount | CachedCount | ApproximateCount | None = None
+) -> (PagedResponseSchema[T], int, bool):
     """
     Paginate query.
 
     :param session: A database session.
     :param stmt: A SELECT statement to paginate.
     :param page_params: A PageParams, containing parameters for page.
+    :param counter: A strategy to count records, ExactCount by default.
+    :return: Paginated statement, count of pages and whether the count of pages is an estimate.
     """
-    stmt_records_count = await count_records(session, stmt)
-    pages_count = (stmt_records_count - 1) // page_params.size + 1
+    records_count = await (counter or ExactCount()).count(session, stmt)
+    pages_count = (records_count.value - 1) // page_params.size + 1
 
+    if records_count.estimated and page_params.page > pages_count:
+        # Estimate can be lower than real count: count exactly, to tell the real last page.
+        records_count = await ExactCount().count(session, stmt)
+        pages_count = (records_count.value - 1) // page_params.size + 1
     if page_params.page > pages_count:
         raise ValueError('Page number is greater than total count (%s > %s)' % (page_params.page, pages_count))
 
     paginated_stmt = stmt.offset((page_params.page - 1) * page_params.size).limit(page_params.size)
-    return paginated_stmt, pages_count
+    return paginated_stmt, pages_count, records_count.estimated
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Encode values of the keyset columns to opaque cursor."""
+    return urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str, keys: Sequence[InstrumentedAttribute]) -> list:
+    """Decode cursor to values of the keyset columns."""
+    try:
+        raw_values = json.loads(urlsafe_b64decode(cursor.encode()))
+        if len(raw_values) != len(keys):
+            raise ValueError
+
+        values = []
+        for key, value in zip(keys, raw_values):
+            python_type = key.type.python_type
+            # Values are JSON strings, or numbers of numeric keys: anything else is a crafted cursor.
+            if not isinstance(value, str) and type(value) is not python_type:
+                raise ValueError
+            values.append(python_type.fromisoformat(value) if python_type is datetime else python_type(value))
+        return values
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+async def paginate_by_cursor(
+    session: AsyncSession, stmt: Select, keys: Sequence[InstrumentedAttribute], cursor: str | None, size: int
+) -> (list[T], str | None):
+    """
+    Paginate query by keyset, in descending order of keys.
+
+    Unlike OFFSET pagination, cost of a page does not depend on its depth, and records are not counted.
+
+    :param session: A database session.
+    :param stmt: A SELECT statement to paginate, without ORDER BY.
+    :param keys: Columns, which values uniquely identify a record, e.g. (created, id).
+    :param cursor: A cursor returned with the previous page. Empty for the first page.
+    :param size: Page size.
+    :return: Records of the page and cursor of the next page, None if this page is the last.
+    """
+    if cursor:
+        stmt = stmt.where(tuple_(*keys) < tuple_(*decode_cursor(cursor, keys)))
+    stmt = stmt.order_by(*(desc(key) for key in keys)).limit(size + 1)
+
+    records = (await session.scalars(stmt)).all()
+    if len(records) <= size:
+        return records, None
+
+    last_record = records[size - 1]
+    return records[:size], encode_cursor([getattr(last_record, key.key) for key in keys])
@@ -0,0 +1,109 @@
+import json
+import platform
+import subprocess
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.core.config import settings as app_settings
+from src.core.db import get_async_session
+from src.models import User
+from tests.benchmarks.runner import Scenario, ScenarioResult, run_scenario
+from tests.functional.settings import settings
+
+PASSWORD = 'testpassword'
+
+results_key = pytest.StashKey[dict[str, ScenarioResult]]()
+
+
+@pytest.fixture(autouse=True)
+def disable_rate_limit(monkeypatch):
+    monkeypatch.setattr(app_settings.rate_limit, 'enabled', False)
+
+
+@pytest.fixture
+def concurrency(request) -> int:
+    return request.config.getoption('--benchmark-concurrency')
+
+
+@pytest_asyncio.fixture
+async def bench_app(app_with_overridden_redis, test_db_session, concurrency):
+    """App with a session per request, as in production, so that concurrent clients don't share a session."""
+    engine = create_async_engine(settings.test_database_url, pool_size=concurrency)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def get_session():
+        async with session_factory() as session:
+            yield session
+
+    app_with_overridden_redis.dependency_overrides[get_async_session] = get_session
+    yield app_with_overridden_redis
+    app_with_overridden_redis.dependency_overrides.pop(get_async_session)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def bench_users(test_db_session, roles_fixture, concurrency) -> list[User]:
+    """User per concurrent client, as login invalidates refresh tokens of the other sessions of the user."""
+    users = [User(username=f'benchuser{number}', password=PASSWORD, role=roles_fixture['user']) for number in range(concurrency)]
+    test_db_session.add_all(users)
+    await test_db_session.commit()
+    return users
+
+
+@pytest.fixture
+def benchmark(request, bench_app, concurrency):
+    async def run(scenario: Scenario) -> ScenarioResult:
+        result = await run_scenario(bench_app, scenario, request.config.getoption('--benchmark-requests'), concurrency)
+        request.config.stash.setdefault(results_key, {})[result.name] = result
+        return result
+    return run
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not (results := config.stash.get(results_key, None)):
+        return
+
+    baseline = {}
+    if compare_path := config.getoption('--benchmark-compare'):
+        baseline = json.loads(Path(compare_path).read_text())['scenarios']
+
+    terminalreporter.section('benchmarks')
+    terminalreporter.write_line(f'{"scenario":<20}{"requests":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"req/s":>10}')
+    for result in results.values():
+        terminalreporter.write_line(
+            f'{result.name:<20}{result.requests:>10}{result.p50_ms:>10.3f}{result.p95_ms:>10.3f}{result.p99_ms:>10.3f}'
+            f'{result.rps:>10.1f}'
+        )
+        if previous := baseline.get(result.name):
+            terminalreporter.write_line(
+                f'{"  vs baseline":<30}{_change(previous["p50_ms"], result.p50_ms):>10}'
+                f'{_change(previous["p95_ms"], result.p95_ms):>10}{_change(previous["p99_ms"], result.p99_ms):>10}'
+                f'{_change(previous["rps"], result.rps):>10}'
+            )
+
+    if save_path := config.getoption('--benchmark-save'):
+        Path(save_path).write_text(json.dumps(_baseline(config, results), indent=2) + '\n')
+        terminalreporter.write_line(f'Baseline saved to {save_path}')
+
+
+def _change(previous: float, current: float) -> str:
+    return f'{(current - previous) / previous:+.0%}' if previous else '-'
+
+
+def _baseline(config, results: dict[str, ScenarioResult]) -> dict:
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    return {
+        'meta': {
+            'commit': commit or None,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'requests': config.getoption('--benchmark-requests'),
+            'concurrency': config.getoption('--benchmark-concurrency'),
+        },
+        'scenarios': {name: asdict(result) for name, result in results.items()},
+    }
@@ -0,0 +1,80 @@
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from fastapi import FastAPI
+from httpx import AsyncClient, Response
+
+ClientStep = Callable[[AsyncClient, int], Awaitable[None]]
+
+
+@dataclass
+class Scenario:
+    """
+    Benchmark scenario. Each concurrent client runs `setup` once, then sends its share of requests with `action`.
+
+    :param name: Scenario name in the report.
+    :param action: Sends the timed request. Called with the client and the request number.
+    :param expected_status: Status code of a successful response.
+    :param setup: Prepares the client, e.g. logs in. Called with the client and the client number.
+    :param before_each: Untimed step before each request, e.g. login before logout.
+    """
+    name: str
+    action: Callable[[AsyncClient, int], Awaitable[Response]]
+    expected_status: int = 200
+    setup: ClientStep | None = None
+    before_each: ClientStep | None = None
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    concurrency: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    rps: float
+
+    @classmethod
+    def from_latencies(cls, name: str, latencies: list[float], concurrency: int) -> 'ScenarioResult':
+        percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+        return cls(
+            name=name,
+            requests=len(latencies),
+            concurrency=concurrency,
+            p50_ms=round(percentiles[49] * 1000, 3),
+            p95_ms=round(percentiles[94] * 1000, 3),
+            p99_ms=round(percentiles[98] * 1000, 3),
+            # Throughput of the time clients spent waiting for responses, untimed steps are excluded.
+            rps=round(len(latencies) / (sum(latencies) / concurrency), 1),
+        )
+
+
+async def run_scenario(app: FastAPI, scenario: Scenario, requests: int, concurrency: int, warmup: int = 5) -> ScenarioResult:
+    """Send requests to the ASGI app in process from `concurrency` clients and measure latency of each request."""
+    latencies = []
+
+    async def run_client(client_number: int):
+        async with AsyncClient(app=app, base_url='http://test') as client:
+            if scenario.setup:
+                await scenario.setup(client, client_number)
+
+            count = requests // concurrency + (client_number < requests % concurrency)
+            for index in range(-warmup, count):
+                request_number = index * concurrency + client_number
+                if scenario.before_each:
+                    await scenario.before_each(client, request_number)
+
+                started_at = time.perf_counter()
+                response = await scenario.action(client, request_number)
+                elapsed = time.perf_counter() - started_at
+
+                assert response.status_code == scenario.expected_status, (scenario.name, response.text)
+                if index >= 0:
+                    latencies.append(elapsed)
+
+    await asyncio.gather(*(run_client(client_number) for client_number in range(concurrency)))
+    return ScenarioResult.from_latencies(scenario.name, latencies, concurrency)
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import insert
+
+from src.models import LoginHistory
+from tests.benchmarks.conftest import PASSWORD
+from tests.benchmarks.runner import Scenario
+
+HISTORY_SIZE = 1000
+HISTORY_PAGE_SIZE = 50
+
+
+async def login(client: AsyncClient, username: str):
+    response = await client.post('/auth/login', json={'username': username, 'password': PASSWORD})
+    assert response.status_code == HTTPStatus.OK
+    client.cookies = response.cookies
+
+
+@pytest_asyncio.fixture
+async def long_history(test_db_session, bench_users):
+    now = datetime.now()
+    for user in bench_users:
+        rows = [{'id': uuid4(), 'user_id': user.id, 'login_time': now - timedelta(minutes=i)} for i in range(HISTORY_SIZE)]
+        await test_db_session.execute(insert(LoginHistory), rows)
+    await test_db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_register(benchmark, roles_fixture):
+    await benchmark(Scenario(
+        name='register',
+        action=lambda client, _: client.post('/auth/register', json={'username': f'bench{uuid4().hex}', 'password': PASSWORD}),
+        expected_status=HTTPStatus.CREATED,
+    ))
+
+
+@pytest.mark.asyncio
+async def test_login(benchmark, bench_users):
+    await benchmark(Scenario(
+        name='login',
+        action=lambda client, number: client.post(
+            '/auth/login', json={'username': bench_users[number % len(bench_users)].username, 'password': PASSWORD}
+        ),
+    ))
+
+
+@pytest.mark.asyncio
+async def test_refresh(benchmark, bench_users):
+    async def refresh(client: AsyncClient, _):
+        response = await client.post('/auth/refresh')
+        client.cookies = response.cookies
+        return response
+
+    await benchmark(Scenario(
+        name='refresh',
+        setup=lambda client, number: login(client, bench_users[number].username),
+        action=refresh,
+    ))
+
+
+@pytest.mark.asyncio
+async def test_logout(benchmark, bench_users, concurrency):
+    await benchmark(Scenario(
+        name='logout',
+        before_each=lambda client, number: login(client, bench_users[number % concurrency].username),
+        action=lambda client, _: client.post('/auth/logout'),
+    ))
+
+
+@pytest.mark.asyncio
+async def test_history_paging(benchmark, bench_users, long_history):
+    pages = HISTORY_SIZE // HISTORY_PAGE_SIZE
+    await benchmark(Scenario(
+        name='history_page',
+        setup=lambda client, number: login(client, bench_users[number].username),
+        action=lambda client, number: client.get('/history/', params={'page': number % pages + 1, 'size': HISTORY_PAGE_SIZE}),
+    ))
+
+
+@pytest.mark.asyncio
+async def test_history_cursor(benchmark, bench_users, long_history):
+    async def next_page(client: AsyncClient, _):
+        response = await client.get('/history/', params={'cursor': client.next_cursor or '', 'size': HISTORY_PAGE_SIZE})
+        client.next_cursor = response.json().get('next')
+        return response
+
+    async def setup(client: AsyncClient, number: int):
+        await login(client, bench_users[number].username)
+        client.next_cursor = None
+
+    await benchmark(Scenario(name='history_cursor', setup=setup, action=next_page))
+
+
+@pytest.mark.asyncio
+async def test_role_assign(benchmark, superuser_fixture, bench_users, roles_fixture):
+    role_names = [roles_fixture['testrole'].name, roles_fixture['user'].name]
+    await benchmark(Scenario(
+        name='role_assign',
+        setup=lambda client, _: login(client, superuser_fixture.username),
+        action=lambda client, number: client.post('/role/assign', params={
+            'username': bench_users[number % len(bench_users)].username, 'role_name': role_names[number % 2],
+        }),
+    ))
+
+
+@pytest.mark.asyncio
+async def test_role_list(benchmark, superuser_fixture):
+    await benchmark(Scenario(
+        name='role_list',
+        setup=lambda client, _: login(client, superuser_fixture.username),
+        action=lambda client, _: client.get('/role/'),
+    ))
@@ -0,0 +1,39 @@
+import pytest
+from passlib.context import CryptContext
+from sqlalchemy import update
+
+from src.core import hashing
+from src.models import User
+from tests.benchmarks.conftest import PASSWORD
+from tests.benchmarks.runner import Scenario, ScenarioResult
+from tests.benchmarks.test_endpoints import login
+
+# Argon2 time costs of stored hashes. Rename must take the same time with either.
+LOW_TIME_COST = 1
+HIGH_TIME_COST = 8
+
+
+@pytest.mark.asyncio
+async def test_rename_does_not_scale_with_hash_cost(benchmark, bench_users, test_db_session, monkeypatch):
+    results: dict[int, ScenarioResult] = {}
+    for time_cost in (LOW_TIME_COST, HIGH_TIME_COST):
+        context = CryptContext(schemes=['argon2'], argon2__time_cost=time_cost, argon2__memory_cost=8192, argon2__parallelism=1)
+        monkeypatch.setattr(hashing, 'pwd_context', context)
+        await test_db_session.execute(
+            update(User).where(User.id.in_([user.id for user in bench_users])).values(password_hash=context.hash(PASSWORD))
+        )
+        await test_db_session.commit()
+
+        results[time_cost] = await benchmark(Scenario(
+            name=f'rename_t{time_cost}',
+            setup=lambda client, number: login(client, bench_users[number].username),
+            action=lambda client, number, time_cost=time_cost: client.post(
+                '/account/change_username', params={'new_username': f'renamed{time_cost}_{number}'}
+            ),
+        ))
+        for user in bench_users:
+            await test_db_session.execute(update(User).where(User.id == user.id).values(username=user.username))
+        await test_db_session.commit()
+
+    # With an argon2 verify per rename, the high cost takes several times longer.
+    assert results[HIGH_TIME_COST].p50_ms < results[LOW_TIME_COST].p50_ms * 2, results
@@ -0,0 +1,75 @@
+import json
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from src.api.responses import schema_response
+from src.api.v1.auth import LOGIN_RESPONSE
+from src.main import app
+from src.schemas.history import HistorySchema
+from src.schemas.responses import PagedResponseSchema
+from tests.benchmarks.conftest import results_key
+from tests.benchmarks.runner import ScenarioResult
+
+ITERATIONS = 2000
+
+
+@pytest.fixture
+def measure(request):
+    """Measure a serialization function, called ITERATIONS times, and add it to the report."""
+    async def run(name: str, func) -> ScenarioResult:
+        latencies = []
+        for _ in range(ITERATIONS):
+            started_at = time.perf_counter()
+            await func()
+            latencies.append(time.perf_counter() - started_at)
+        result = ScenarioResult.from_latencies(name, latencies, concurrency=1)
+        request.config.stash.setdefault(results_key, {})[name] = result
+        return result
+    return run
+
+
+def get_response_field(path: str):
+    return next(route.response_field for route in app.routes if route.path == path)
+
+
+@pytest.mark.asyncio
+async def test_history_page_serialization(measure):
+    now = datetime.now()
+    page = PagedResponseSchema[HistorySchema](
+        page=1, size=50, last=20,
+        items=[HistorySchema(user_id=uuid4(), login_time=now - timedelta(minutes=i)) for i in range(50)],
+    )
+    response_field = get_response_field('/history/')
+
+    async def validated():
+        content = await serialize_response(field=response_field, response_content=page, exclude_none=True)
+        return JSONResponse(content)
+
+    async def trusted():
+        return schema_response(page, exclude_none=True)
+
+    assert json.loads((await validated()).body) == json.loads((await trusted()).body)
+
+    before, after = await measure('history_validated', validated), await measure('history_trusted', trusted)
+
+    assert after.p50_ms < before.p50_ms
+
+
+@pytest.mark.asyncio
+async def test_detail_serialization(measure):
+    response_field = get_response_field('/auth/login')
+
+    async def validated():
+        return JSONResponse(await serialize_response(field=response_field, response_content={'detail': 'Successfully login'}))
+
+    async def pre_encoded():
+        return LOGIN_RESPONSE()
+
+    before, after = await measure('detail_validated', validated), await measure('detail_pre_encoded', pre_encoded)
+
+    assert after.p50_ms < before.p50_ms
@@ -15,3 +15,17 @@ def event_loop():
     loop = asyncio.new_event_loop()
     yield loop
     loop.close()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark')
+    group.addoption('--benchmark', action='store_true', help='Run benchmarks from tests/benchmarks instead of skipping them.')
+    group.addoption('--benchmark-requests', type=int, default=200, help='Timed requests per scenario.')
+    group.addoption('--benchmark-concurrency', type=int, default=4, help='Concurrent clients per scenario.')
+    group.addoption('--benchmark-save', metavar='PATH', help='Save results to a JSON baseline.')
+    group.addoption('--benchmark-compare', metavar='PATH', help='Compare results with a JSON baseline.')
+
+
+def pytest_ignore_collect(collection_path, config):
+    if collection_path.name == 'benchmarks' and not config.getoption('--benchmark'):
+        return True
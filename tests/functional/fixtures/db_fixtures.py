@@ -1,6 +1,6 @@
 import pytest
 import pytest_asyncio
-from sqlalchemy import delete
+from sqlalchemy import delete, event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from src.core.db import Base, get_async_session
@@ -36,3 +36,17 @@ async def test_db_session():
 def app_with_overridden_db(test_db_session):
     app.dependency_overrides[get_async_session] = lambda: test_db_session
     return app
+
+
+@pytest.fixture
+def statements_log(test_db_session):
+    """List of SQL statements sent to the database while the fixture is active."""
+    statements = []
+
+    def log_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = test_db_session.bind.sync_engine
+    event.listen(engine, 'before_cursor_execute', log_statement)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', log_statement)
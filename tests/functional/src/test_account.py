@@ -3,6 +3,7 @@ from http import HTTPStatus
 import pytest
 from sqlalchemy import select
 
+from src.core import hashing
 from src.models import User
 
 
@@ -34,3 +35,37 @@ async def test_change_password(authenticated_client, params, expected, user_fixt
     if response.status_code == HTTPStatus.OK:
         await test_db_session.refresh(user_fixture)
         assert user_fixture.is_correct_password(params["new_password"])
+
+
+@pytest.mark.asyncio
+async def test_change_username_does_not_hash(authenticated_client, user_fixture, monkeypatch):
+    monkeypatch.setattr(hashing, 'pwd_context', None)
+
+    response = await authenticated_client.post("/account/change_username", params={"new_username": "new_name"})
+
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.asyncio
+async def test_password_cannot_be_same_as_username(authenticated_client, user_fixture):
+    params = {"old_password": "testpassword", "new_password": user_fixture.username * 2}
+    await authenticated_client.post("/account/change_username", params={"new_username": params["new_password"]})
+
+    response = await authenticated_client.post("/account/change_password", params=params)
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_change_password_with_revoked_token(authenticated_client, user_fixture):
+    cookies = dict(authenticated_client.cookies)
+    response = await authenticated_client.post("/auth/logout")
+    assert response.status_code == HTTPStatus.OK
+
+    # Access token of the logged out session, e.g. stolen before the logout.
+    authenticated_client.cookies = cookies
+    response = await authenticated_client.post(
+        "/account/change_password", params={"old_password": "testpassword", "new_password": "new_password"}
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
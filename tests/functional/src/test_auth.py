@@ -1,9 +1,21 @@
+import asyncio
+import time
 from http import HTTPStatus
 
+import jwt
 import pytest
+from passlib.hash import argon2
+from redis.exceptions import RedisError
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from src.models import User
+from src.core.config import RouteRateLimit, settings
+from src.core.constants import DEFAULT_ROLE_DATA
+from src.core.hashing import pwd_context
+from src.models import Role, User
+from src.services.authentication import TokenDenylist
+from src.services.rate_limit import LocalRateLimiter
+from src.services.username_filter import UsernameFilter, get_username_filter
 
 
 @pytest.mark.asyncio
@@ -23,6 +35,18 @@ async def test_register_success(client_fixture, test_db_session, roles_fixture):
     assert user.role_id == roles_fixture["user"].id
 
 
+@pytest.mark.asyncio
+async def test_register_creates_missing_default_role(client_fixture, test_db_session):
+    response = await client_fixture.post('/auth/register', json={'username': 'newuser', 'password': 'strongpassword'})
+
+    assert response.status_code == HTTPStatus.CREATED
+
+    user = (await test_db_session.scalars(select(User).where(User.username == 'newuser'))).first()  # noqa
+    role = (await test_db_session.scalars(select(Role).where(Role.id == user.role_id))).first()  # noqa
+
+    assert role.name == DEFAULT_ROLE_DATA['name']
+
+
 @pytest.mark.asyncio
 async def test_register_weak_password(client_fixture, test_db_session):
     response = await client_fixture.post('/auth/register', json={
@@ -64,6 +88,40 @@ async def test_login_success(client_fixture, user_fixture):
     assert 'access_token_cookie=' in cookies
 
 
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password_hash(client_fixture, user_fixture, test_db_session):
+    user_fixture.password_hash = argon2.using(time_cost=1, memory_cost=8192, parallelism=1).hash('testpassword')
+    await test_db_session.commit()
+    assert pwd_context.needs_update(user_fixture.password_hash)
+
+    response = await client_fixture.post('/auth/login', json={
+        'username': user_fixture.username,
+        'password': 'testpassword'
+    })
+
+    assert response.status_code == HTTPStatus.OK
+    await test_db_session.refresh(user_fixture)
+    assert not pwd_context.needs_update(user_fixture.password_hash)
+    assert user_fixture.is_correct_password('testpassword')
+
+
+@pytest.mark.asyncio
+async def test_login_fetches_user_with_role_in_one_query(client_fixture, user_fixture, test_db_session, statements_log):
+    test_db_session.expunge_all()
+    statements_log.clear()
+
+    response = await client_fixture.post('/auth/login', json={
+        'username': user_fixture.username,
+        'password': 'testpassword'
+    })
+
+    assert response.status_code == HTTPStatus.OK
+
+    user_or_role_queries = [stmt for stmt in statements_log if 'FROM "user"' in stmt or 'FROM role' in stmt]
+
+    assert len(user_or_role_queries) == 1
+
+
 @pytest.mark.asyncio
 async def test_login_wrong_password(client_fixture, user_fixture):
     response = await client_fixture.post('/auth/login', json={
@@ -96,6 +154,36 @@ async def test_refresh_token(authenticated_client):
     assert 'access_token_cookie=' in cookies
 
 
+@pytest.mark.asyncio
+async def test_refresh_token_single_query(authenticated_client, test_db_session, statements_log):
+    test_db_session.expunge_all()
+    statements_log.clear()
+
+    response = await authenticated_client.post("/auth/refresh")
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(statements_log) == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_verifies_each_token_once(authenticated_client, monkeypatch):
+    verified_tokens = []
+    decode = jwt.decode
+
+    def counting_decode(token, *args, **kwargs):
+        if kwargs.get('options', {}).get('verify_signature', True):
+            verified_tokens.append(token)
+        return decode(token, *args, **kwargs)
+
+    monkeypatch.setattr(jwt, 'decode', counting_decode)
+
+    response = await authenticated_client.post("/auth/refresh")
+
+    assert response.status_code == HTTPStatus.OK
+    # Access token is checked by the permission dependency, refresh token by the handler.
+    assert len(verified_tokens) == len(set(verified_tokens)) == 2
+
+
 @pytest.mark.asyncio
 async def test_logout(authenticated_client):
     refresh_token_cookie = authenticated_client.cookies.get("refresh_token_cookie")
@@ -114,3 +202,172 @@ async def test_logout(authenticated_client):
     )
 
     assert protected_response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_access_token(authenticated_client):
+    access_token_cookie = authenticated_client.cookies.get("access_token_cookie")
+
+    logout_response = await authenticated_client.post("/auth/logout")
+
+    assert logout_response.status_code == HTTPStatus.OK
+
+    response = await authenticated_client.get("/history/", cookies={"access_token_cookie": access_token_cookie})
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_token_revocation_reaches_other_workers(fake_redis):
+    worker = TokenDenylist(fake_redis, retention=60, sweep_interval=60)
+    other_worker = TokenDenylist(fake_redis, retention=60, sweep_interval=60)
+    worker_follower = asyncio.create_task(other_worker.follow(block_ms=10))
+
+    await worker.revoke('revoked-jti', int(time.time()) + 60)
+    await worker.revoke('expired-jti', int(time.time()) - 1)
+    for _ in range(100):
+        if len(other_worker) == 2:
+            break
+        await asyncio.sleep(0.01)
+    worker_follower.cancel()
+
+    assert other_worker.is_revoked('revoked-jti')
+    assert not other_worker.is_revoked('expired-jti')
+    assert not other_worker.is_revoked('other-jti')
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_cant_be_reused(authenticated_client):
+    refresh_token_cookie = authenticated_client.cookies.get("refresh_token_cookie")
+
+    response = await authenticated_client.post("/auth/refresh")
+
+    assert response.status_code == HTTPStatus.OK
+
+    response = await authenticated_client.post("/auth/refresh", cookies={"refresh_token_cookie": refresh_token_cookie})
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_login_rate_limited_by_username(client_fixture, user_fixture, monkeypatch):
+    monkeypatch.setitem(settings.rate_limit.routes, 'login', RouteRateLimit(ip=100, username=2))
+    login_data = {'username': user_fixture.username, 'password': 'wrongpassword'}
+
+    for _ in range(2):
+        response = await client_fixture.post('/auth/login', json=login_data)
+
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    response = await client_fixture.post('/auth/login', json=login_data)
+
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert 0 < int(response.headers['Retry-After']) <= 60
+
+    response = await client_fixture.post('/auth/login', json={'username': 'otheruser', 'password': 'wrongpassword'})
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_local_rate_limiter_rejects_bursts():
+    limiter = LocalRateLimiter(capacity=2, rate=0.5, max_clients=1)
+
+    assert limiter.acquire('login:1.1.1.1') == 0
+    assert limiter.acquire('login:1.1.1.1') == 0
+    assert 0 < limiter.acquire('login:1.1.1.1') <= 2
+    assert limiter.acquire('login:2.2.2.2') == 0
+
+
+@pytest.mark.asyncio
+async def test_username_filter_short_circuits_unknown_usernames(
+        client_fixture, fake_redis, user_fixture, test_db_session, statements_log):
+    await get_username_filter(redis=fake_redis).build(test_db_session)
+    statements_log.clear()
+
+    response = await client_fixture.post('/auth/login', json={'username': 'unknownuser', 'password': 'testpassword'})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+    response = await client_fixture.get('/auth/username_available', params={'username': 'unknownuser'})
+    assert response.json() == {'username': 'unknownuser', 'available': True}
+
+    assert not [stmt for stmt in statements_log if 'FROM "user"' in stmt]
+
+    response = await client_fixture.get('/auth/username_available', params={'username': user_fixture.username})
+    assert response.json() == {'username': user_fixture.username, 'available': False}
+
+    response = await client_fixture.post('/auth/register', json={'username': 'newuser', 'password': 'strongpassword'})
+    assert response.status_code == HTTPStatus.CREATED
+
+    response = await client_fixture.post('/auth/login', json={'username': 'newuser', 'password': 'strongpassword'})
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.asyncio
+async def test_username_filter_is_disabled_until_built(fake_redis):
+    username_filter = UsernameFilter(fake_redis, settings.username_filter)
+
+    assert await username_filter.might_contain('unknownuser')
+
+
+@pytest.mark.asyncio
+async def test_username_filter_is_disabled_when_evicted(fake_redis, user_fixture, test_db_session):
+    username_filter = UsernameFilter(fake_redis, settings.username_filter)
+    await username_filter.build(test_db_session)
+
+    assert not await username_filter.might_contain('unknownuser')
+
+    await fake_redis.delete(username_filter.key)
+
+    assert await username_filter.might_contain('unknownuser')
+    assert await username_filter.might_contain(user_fixture.username)
+
+
+@pytest.mark.asyncio
+async def test_username_filter_is_rebuilt_after_failed_add(fake_redis, user_fixture, test_db_session, monkeypatch):
+    username_filter = UsernameFilter(fake_redis, settings.username_filter)
+    builder = asyncio.create_task(username_filter.keep_built(async_sessionmaker(test_db_session.bind), check_interval=60))
+
+    async def wait_built():
+        async with asyncio.timeout(5):
+            while not await fake_redis.getbit(username_filter.key, username_filter.ready_offset):
+                await asyncio.sleep(0.01)
+
+    try:
+        await wait_built()
+        assert not await username_filter.might_contain('newuser')
+
+        set_bits = username_filter._set_bits
+
+        async def failing_set_bits(usernames):
+            monkeypatch.setattr(username_filter, '_set_bits', set_bits)
+            raise RedisError('Connection lost')
+
+        monkeypatch.setattr(username_filter, '_set_bits', failing_set_bits)
+        await username_filter.add('newuser')
+
+        assert await username_filter.might_contain('unknownuser')
+
+        await wait_built()
+
+        assert await username_filter.might_contain('newuser')
+        assert not await username_filter.might_contain('unknownuser')
+    finally:
+        builder.cancel()
+
+
+@pytest.mark.asyncio
+async def test_register_is_single_statement(client_fixture, roles_fixture, user_fixture, statements_log):
+    statements_log.clear()
+
+    response = await client_fixture.post('/auth/register', json={'username': 'newuser', 'password': 'strongpassword'})
+
+    assert response.status_code == HTTPStatus.CREATED
+    assert len(statements_log) == 1
+    assert statements_log[0].startswith('INSERT INTO "user"')
+
+    statements_log.clear()
+
+    response = await client_fixture.post('/auth/register', json={'username': 'newuser', 'password': 'strongpassword'})
+
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert len(statements_log) == 1
@@ -0,0 +1,49 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+from prometheus_client import REGISTRY
+
+from src.core.hashing import PasswordHasher
+
+
+@pytest.mark.asyncio
+async def test_queue_depth():
+    hasher = PasswordHasher('thread', max_workers=1)
+    try:
+        tasks = [asyncio.create_task(hasher.hash('testpassword')) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        assert hasher.queue_depth == 2
+        assert hasher.stats() == {'executor': 'thread', 'max_workers': 1, 'pending': 3, 'queue_depth': 2}
+        assert REGISTRY.get_sample_value('password_hashing_queue_depth') == 2
+
+        await asyncio.gather(*tasks)
+
+        assert hasher.queue_depth == 0
+        assert REGISTRY.get_sample_value('password_hashing_queue_depth') == 0
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.parametrize('executor_type, executor_class', [
+    ('thread', ThreadPoolExecutor),
+    ('process', ProcessPoolExecutor),
+])
+@pytest.mark.asyncio
+async def test_hash_and_verify(executor_type, executor_class):
+    hasher = PasswordHasher(executor_type, max_workers=2)
+    assert hasher._executor is None  # created lazily, after the worker fork
+
+    password_hash = await hasher.hash('testpassword')
+
+    assert isinstance(hasher._executor, executor_class)
+    assert await hasher.verify('testpassword', password_hash)
+    assert not await hasher.verify('wrongpassword', password_hash)
+
+    hasher.shutdown()
+
+    assert hasher._executor is None
+    # The pool is recreated on the next call.
+    assert await hasher.verify('testpassword', password_hash)
+    hasher.shutdown()
@@ -1,9 +1,13 @@
+from datetime import datetime
 from http import HTTPStatus
 
 import pytest
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from src.models import LoginHistory
+from src.services.history import LoginHistoryWriter
+from src.utils.paginate import encode_cursor
 
 
 @pytest.mark.asyncio
@@ -32,3 +36,92 @@ async def test_get_history_validation(authenticated_client, query_data, expected
     response = await authenticated_client.get("/history/", params=query_data)
 
     assert response.status_code == expected_status
+
+
+@pytest.mark.asyncio
+async def test_login_history_write_behind(test_db_session, user_fixture):
+    writer = LoginHistoryWriter(
+        async_sessionmaker(test_db_session.bind), batch_size=2, flush_interval=0.05, queue_size=3
+    )
+    writer.start()
+
+    for _ in range(4):
+        writer.put(user_fixture.id)
+    await writer.stop()
+
+    history = (await test_db_session.scalars(select(LoginHistory).where(LoginHistory.user_id == user_fixture.id))).all()  # noqa
+
+    assert len(history) == 3
+    assert writer.stats() == {'queued': 0, 'flushed': 3, 'dropped': 1}
+
+
+@pytest.mark.asyncio
+async def test_get_history_by_cursor(authenticated_client, test_db_session, user_fixture):
+    test_db_session.add_all(
+        LoginHistory(user_id=user_fixture.id, login_time=datetime(2024, 1, day)) for day in range(1, 5)
+    )
+    await test_db_session.commit()
+
+    login_times = []
+    params = {"cursor": "", "size": 2}
+    while True:
+        response = await authenticated_client.get("/history/", params=params)
+
+        assert response.status_code == HTTPStatus.OK
+        assert "last" not in response.json()
+
+        login_times.extend(item["login_time"] for item in response.json()["items"])
+        if not response.json().get("next"):
+            break
+        params["cursor"] = response.json()["next"]
+
+    assert len(login_times) == 5  # 4 added records and the login of authenticated_client
+    assert login_times == sorted(login_times, reverse=True)
+
+
+@pytest.mark.parametrize("cursor", [
+    "invalid",
+    encode_cursor(["2024-01-01T00:00:00", 123]),
+    encode_cursor([None, [1]]),
+])
+@pytest.mark.asyncio
+async def test_get_history_invalid_cursor(authenticated_client, cursor):
+    response = await authenticated_client.get("/history/", params={"cursor": cursor})
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_get_history_count_is_cached(authenticated_client, statements_log):
+    await authenticated_client.get("/history/")
+    statements_log.clear()
+
+    response = await authenticated_client.get("/history/")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["last"] == 1
+    assert response.json()["last_is_estimate"] is True
+    assert not [stmt for stmt in statements_log if 'count(' in stmt]
+
+
+@pytest.mark.asyncio
+async def test_get_history_page_added_after_count_is_cached(authenticated_client, user_fixture):
+    response = await authenticated_client.get("/history/", params={"size": 1})
+
+    assert response.json()["last"] == 1
+    assert response.json()["last_is_estimate"] is False
+
+    response = await authenticated_client.post(
+        "/auth/login", json={"username": user_fixture.username, "password": "testpassword"}
+    )
+    authenticated_client.cookies = response.cookies
+    response = await authenticated_client.get("/history/", params={"page": 2, "size": 1})
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.json()["items"]) == 1
+    assert response.json()["last"] == 2
+    assert response.json()["last_is_estimate"] is False
+
+    response = await authenticated_client.get("/history/", params={"page": 1000, "size": 1})
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
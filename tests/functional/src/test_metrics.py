@@ -0,0 +1,128 @@
+from http import HTTPStatus
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from redis.asyncio import Redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core import db
+from src.core.config import settings as app_settings
+from src.core.db import create_engine
+from src.db.redis import InstrumentedBlockingConnectionPool, close_redis
+from tests.functional.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_metrics(authenticated_client, roles_fixture):
+    response = await authenticated_client.patch(f"/role/{roles_fixture['testrole'].id}", json={})
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+    response = await authenticated_client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/plain')
+
+    metrics = response.text
+
+    assert 'http_request_duration_seconds_count{method="POST",route="/auth/login",status="200"}' in metrics
+    # Route template is used, not the path with role ID.
+    assert 'http_request_duration_seconds_count{method="PATCH",route="/role/{role_id}",status="403"}' in metrics
+    assert 'http_requests_in_progress{method="GET",route="/metrics"} 1.0' in metrics
+    assert 'password_hashing_duration_seconds_count{operation="verify"}' in metrics
+
+
+@pytest_asyncio.fixture
+async def app_with_request_sessions(app_with_overridden_db, monkeypatch):
+    """App with sessions made by `get_async_session` itself, from an engine with the instrumented pool."""
+    engine = create_engine(settings.test_database_url, app_settings.database)
+    monkeypatch.setattr(db, 'AsyncSessionLocal', async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+    override = app_with_overridden_db.dependency_overrides.pop(db.get_async_session)
+    yield app_with_overridden_db
+    app_with_overridden_db.dependency_overrides[db.get_async_session] = override
+    await engine.dispose()
+
+
+def checkouts(route: str, status: int) -> tuple[float, float]:
+    labels = {'route': route, 'status': str(status)}
+    return (
+        REGISTRY.get_sample_value('http_request_db_checkouts_count', labels) or 0,
+        REGISTRY.get_sample_value('http_request_db_checkouts_sum', labels) or 0,
+    )
+
+
+@pytest.mark.asyncio
+async def test_rejected_requests_check_out_no_connections(app_with_request_sessions, authenticated_client, roles_fixture):
+    unauthorized_before = checkouts('/history/', HTTPStatus.UNAUTHORIZED)
+    forbidden_before = checkouts('/role/', HTTPStatus.FORBIDDEN)
+    succeeded_before = checkouts('/history/', HTTPStatus.OK)
+
+    async with AsyncClient(app=app_with_request_sessions, base_url='http://test') as anonymous_client:
+        assert (await anonymous_client.get('/history/')).status_code == HTTPStatus.UNAUTHORIZED
+    assert (await authenticated_client.get('/role/')).status_code == HTTPStatus.FORBIDDEN
+    assert (await authenticated_client.get('/history/')).status_code == HTTPStatus.OK
+
+    count, total = checkouts('/history/', HTTPStatus.UNAUTHORIZED)
+    assert (count - unauthorized_before[0], total - unauthorized_before[1]) == (1, 0)
+    count, total = checkouts('/role/', HTTPStatus.FORBIDDEN)
+    assert (count - forbidden_before[0], total - forbidden_before[1]) == (1, 0)
+    count, total = checkouts('/history/', HTTPStatus.OK)
+    assert (count - succeeded_before[0], total - succeeded_before[1]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_request_session_checks_out_on_first_statement(monkeypatch):
+    engine = create_engine(settings.test_database_url, app_settings.database)
+    monkeypatch.setattr(db, 'AsyncSessionLocal', async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+    sessions = db.get_async_session()
+    try:
+        session = await anext(sessions)
+
+        assert engine.pool.checkedout() == 0
+
+        await session.execute(text('SELECT 1'))
+
+        assert engine.pool.checkedout() == 1
+    finally:
+        await sessions.aclose()
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_db_pool_gauges():
+    engine = create_engine(settings.test_database_url, app_settings.database)
+    try:
+        assert REGISTRY.get_sample_value('db_pool_size') == app_settings.database.pool_size
+
+        async with engine.connect() as connection:
+            await connection.execute(text('SELECT 1'))
+            assert REGISTRY.get_sample_value('db_pool_checked_out') == 1
+
+        assert REGISTRY.get_sample_value('db_pool_checked_out') == 0
+        assert REGISTRY.get_sample_value('db_pool_overflow') == 0
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_redis_pool_gauges(authenticated_client):
+    pool = InstrumentedBlockingConnectionPool(
+        connection_class=fakeredis.aioredis.FakeConnection, server=fakeredis.FakeServer(), max_connections=2
+    )
+    client = Redis(connection_pool=pool)
+    try:
+        connection = await pool.get_connection('PING')
+        assert REGISTRY.get_sample_value('redis_pool_connections', {'state': 'in_use'}) == 1
+
+        await pool.release(connection)
+        assert REGISTRY.get_sample_value('redis_pool_connections', {'state': 'in_use'}) == 0
+        assert REGISTRY.get_sample_value('redis_pool_connections', {'state': 'idle'}) == 1
+
+        response = await authenticated_client.get('/metrics')
+        assert 'redis_pool_connections{state="idle"} 1.0' in response.text
+    finally:
+        await close_redis(client)
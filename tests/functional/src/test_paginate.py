@@ -0,0 +1,50 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.schemas.requests import PageParams
+from src.utils.paginate import ApproximateCount, RecordsCount, paginate_statement
+
+numbers = table('approximate_count_numbers', column('number'))
+
+
+@pytest_asyncio.fixture
+async def session(test_db_session):
+    """Session with a temporary table of 10 rows, dropped on rollback."""
+    async with test_db_session.bind.connect() as connection:
+        transaction = await connection.begin()
+        await connection.execute(text('CREATE TEMPORARY TABLE approximate_count_numbers (number integer)'))
+        await connection.execute(text('INSERT INTO approximate_count_numbers SELECT generate_series(1, 10)'))
+        yield AsyncSession(bind=connection)
+        await transaction.rollback()
+
+
+@pytest.mark.asyncio
+async def test_approximate_count(session):
+    # Never analyzed: planner statistics are unknown, records are counted.
+    assert await ApproximateCount().count(session, select(numbers)) == RecordsCount(10)
+
+    await session.execute(text('ANALYZE approximate_count_numbers'))
+
+    assert await ApproximateCount().count(session, select(numbers)) == RecordsCount(10, estimated=True)
+
+
+@pytest.mark.asyncio
+async def test_approximate_count_requires_unfiltered_statement(session):
+    with pytest.raises(ValueError):
+        await ApproximateCount().count(session, select(numbers).where(numbers.c.number > 5))
+
+
+@pytest.mark.asyncio
+async def test_paginate_beyond_estimate(session):
+    await session.execute(text('ANALYZE approximate_count_numbers'))
+    await session.execute(text('INSERT INTO approximate_count_numbers SELECT generate_series(11, 15)'))
+
+    # The estimate is 10 records, 2 pages: the third one is found by an exact count.
+    _, pages_count, estimated = await paginate_statement(session, select(numbers), PageParams(page=3, size=5), ApproximateCount())
+
+    assert (pages_count, estimated) == (3, False)
+
+    with pytest.raises(ValueError):
+        await paginate_statement(session, select(numbers), PageParams(page=1000, size=5), ApproximateCount())
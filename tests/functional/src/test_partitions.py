@@ -0,0 +1,91 @@
+import uuid
+from datetime import date, datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select, text
+
+from src.db.partitions import (
+    add_months,
+    convert_to_partitioned,
+    convert_to_plain,
+    get_partition_months,
+    is_partitioned,
+    maintain_partitions
+)
+from src.models import LoginHistory
+
+
+@pytest_asyncio.fixture
+async def connection(test_db_session, user_fixture):
+    """Connection in a transaction, rolled back with all schema changes."""
+    # End the transaction of the session, its locks would block changes of the schema.
+    await test_db_session.commit()
+    async with test_db_session.bind.connect() as connection:
+        transaction = await connection.begin()
+        yield connection
+        await transaction.rollback()
+
+
+@pytest.mark.parametrize('month, count, expected', [
+    (date(2024, 11, 1), 1, date(2024, 12, 1)),
+    (date(2024, 12, 1), 1, date(2025, 1, 1)),
+    (date(2025, 1, 1), -1, date(2024, 12, 1)),
+    (date(2024, 3, 1), -14, date(2023, 1, 1)),
+    (date(2024, 1, 1), 24, date(2026, 1, 1)),
+])
+def test_add_months(month, count, expected):
+    assert add_months(month, count) == expected
+
+
+@pytest.mark.asyncio
+async def test_maintain_partitions(connection, user_fixture):
+    logins = [datetime(2023, 11, 5), datetime(2024, 1, 20), datetime(2024, 3, 1)]
+    await connection.execute(insert(LoginHistory), [
+        {'id': uuid.uuid4(), 'user_id': user_fixture.id, 'login_time': login_time} for login_time in logins
+    ])
+
+    with pytest.raises(ValueError):
+        await maintain_partitions(connection, retention_months=2, months_ahead=2)
+
+    created = await convert_to_partitioned(connection, months_ahead=2, today=date(2024, 1, 15))
+
+    assert created == [
+        'loginhistory_2023_11', 'loginhistory_2023_12', 'loginhistory_2024_01', 'loginhistory_2024_02', 'loginhistory_2024_03'
+    ]
+    assert await is_partitioned(connection)
+    assert (await connection.scalars(text('SELECT login_time FROM loginhistory_2023_11'))).all() == [logins[0]]
+
+    # Month rollover: partitions of the next year are created, months beyond retention are dropped.
+    created, dropped = await maintain_partitions(connection, retention_months=2, months_ahead=2, today=date(2024, 3, 10))
+
+    assert created == ['loginhistory_2024_04', 'loginhistory_2024_05']
+    assert dropped == ['loginhistory_2023_11', 'loginhistory_2023_12', 'loginhistory_2024_01']
+    assert sorted(await get_partition_months(connection)) == [
+        'loginhistory_2024_02', 'loginhistory_2024_03', 'loginhistory_2024_04', 'loginhistory_2024_05'
+    ]
+    assert (await connection.scalars(select(LoginHistory.login_time))).all() == [logins[2]]
+
+    created, dropped = await maintain_partitions(connection, retention_months=2, months_ahead=2, today=date(2024, 3, 10))
+
+    assert (created, dropped) == ([], [])
+
+    created, dropped = await maintain_partitions(connection, retention_months=2, months_ahead=2, today=date(2024, 12, 31))
+
+    assert created == ['loginhistory_2024_12', 'loginhistory_2025_01', 'loginhistory_2025_02']
+    assert dropped == ['loginhistory_2024_02', 'loginhistory_2024_03', 'loginhistory_2024_04', 'loginhistory_2024_05']
+
+
+@pytest.mark.asyncio
+async def test_convert_to_plain(connection, user_fixture):
+    login_id = uuid.uuid4()
+    await connection.execute(insert(LoginHistory).values(id=login_id, user_id=user_fixture.id, login_time=datetime(2024, 1, 20)))
+    await convert_to_partitioned(connection, months_ahead=0, today=date(2024, 1, 15))
+
+    with pytest.raises(ValueError):
+        await convert_to_partitioned(connection, months_ahead=0)
+
+    await convert_to_plain(connection)
+
+    assert not await is_partitioned(connection)
+    assert (await connection.scalars(select(LoginHistory.id))).all() == [login_id]
@@ -0,0 +1,58 @@
+import fakeredis
+import pytest
+from redis.asyncio import BlockingConnectionPool, RedisCluster
+from redis.exceptions import ConnectionError
+
+from src.core.config import RedisSettings
+from src.db.redis import InstrumentedBlockingConnectionPool, InstrumentedSentinelConnectionPool, close_redis, create_redis, pool_stats
+
+
+@pytest.mark.parametrize('config, pool_class', [
+    (RedisSettings(max_connections=2, pool_timeout=0.1), InstrumentedBlockingConnectionPool),
+    (RedisSettings(mode='sentinel', sentinels=['localhost:26379'], max_connections=2, pool_timeout=0.1),
+     InstrumentedSentinelConnectionPool),
+])
+@pytest.mark.asyncio
+async def test_create_redis_bounds_pool(config, pool_class):
+    client = create_redis(config)
+    pool = client.connection_pool
+    # Connections to an in-memory server: the pool is tested without Redis and Sentinel.
+    pool.connection_class = fakeredis.aioredis.FakeConnection
+    pool.connection_kwargs.pop('connection_pool', None)
+    pool.connection_kwargs.update(server=fakeredis.FakeServer(), health_check_interval=0)
+    try:
+        assert isinstance(pool, pool_class)
+        assert isinstance(pool, BlockingConnectionPool)
+        assert pool_stats(client) == {'in_use': 0, 'idle': 0, 'max_connections': 2}
+
+        connections = [await pool.get_connection('PING') for _ in range(2)]
+
+        assert pool_stats(client) == {'in_use': 2, 'idle': 0, 'max_connections': 2}
+        with pytest.raises(ConnectionError):
+            await pool.get_connection('PING')
+
+        await pool.release(connections[0])
+
+        assert pool_stats(client) == {'in_use': 1, 'idle': 1, 'max_connections': 2}
+        await pool.release(connections[1])
+    finally:
+        await close_redis(client)
+
+
+@pytest.mark.asyncio
+async def test_create_redis_cluster(monkeypatch):
+    client = create_redis(RedisSettings(mode='cluster', max_connections=2))
+    try:
+        assert isinstance(client, RedisCluster)
+        # Nodes are discovered on the first command, startup nodes stand for them.
+        nodes = list(client.nodes_manager.startup_nodes.values())
+        monkeypatch.setattr(client, 'get_nodes', lambda: nodes)
+
+        assert pool_stats(client) == {'in_use': 0, 'idle': 0, 'max_connections': 2}
+
+        connections = [nodes[0].acquire_connection() for _ in range(2)]
+        nodes[0]._free.append(connections[0])
+
+        assert pool_stats(client) == {'in_use': 1, 'idle': 1, 'max_connections': 2}
+    finally:
+        await close_redis(client)
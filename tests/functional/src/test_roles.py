@@ -1,10 +1,14 @@
+import asyncio
+import json
 import uuid
 from http import HTTPStatus
 
 import pytest
 from sqlalchemy import select
 
+from src.core.constants import CLAIMS_VERSIONS_KEY
 from src.models import Role, User
+from src.services.roles import ClaimsVersions, get_role_service
 
 
 @pytest.mark.asyncio
@@ -175,3 +179,185 @@ async def test_error_on_nonexistent_user_or_role(superuser_authenticated_client,
     response = await superuser_authenticated_client.post(endpoint, params=params)
 
     assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_assign_role_uses_cached_role(superuser_authenticated_client, user_fixture, roles_fixture, statements_log):
+    params = {"username": user_fixture.username, "role_name": roles_fixture['testrole'].name}
+    await superuser_authenticated_client.post("/role/assign", params=params)
+    statements_log.clear()
+
+    response = await superuser_authenticated_client.post("/role/assign", params=params)
+
+    assert response.status_code == HTTPStatus.OK
+    assert not [stmt for stmt in statements_log if 'FROM role' in stmt]
+
+
+@pytest.mark.asyncio
+async def test_role_update_invalidates_cache(superuser_authenticated_client, user_fixture, roles_fixture):
+    role = roles_fixture['testrole']
+    params = {"username": user_fixture.username, "role_name": role.name}
+    await superuser_authenticated_client.post("/role/assign", params=params)
+
+    response = await superuser_authenticated_client.patch(f"/role/{role.id}", json={'name': role.name, 'access_level': 5})
+    assert response.status_code == HTTPStatus.OK
+
+    response = await superuser_authenticated_client.post("/role/assign", params=params)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["role"]["access_level"] == 5
+
+
+@pytest.mark.asyncio
+async def test_demotion_invalidates_access_token(superuser_authenticated_client, superuser_fixture, roles_fixture):
+    response = await superuser_authenticated_client.post(
+        "/role/assign",
+        params={"username": superuser_fixture.username, "role_name": roles_fixture['user'].name}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+    response = await superuser_authenticated_client.get("/role/")
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    login_data = {"username": superuser_fixture.username, "password": "testpassword"}
+    response = await superuser_authenticated_client.post("/auth/login", json=login_data)
+    superuser_authenticated_client.cookies = response.cookies
+
+    response = await superuser_authenticated_client.get("/role/")
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+@pytest.mark.asyncio
+async def test_refresh_after_role_change(superuser_authenticated_client, superuser_fixture, roles_fixture):
+    response = await superuser_authenticated_client.post(
+        "/role/assign",
+        params={"username": superuser_fixture.username, "role_name": roles_fixture['user'].name}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response = await superuser_authenticated_client.post("/auth/refresh")
+
+    assert response.status_code == HTTPStatus.OK
+    superuser_authenticated_client.cookies = response.cookies
+
+    # The new token is accepted and carries the new access level.
+    response = await superuser_authenticated_client.get("/role/")
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+@pytest.mark.asyncio
+async def test_claims_versions_mirror(fake_redis, user_fixture):
+    worker, other_worker = ClaimsVersions(fake_redis, 60), ClaimsVersions(fake_redis, 60)
+
+    version = await worker.bump(user_fixture.id)
+
+    assert not worker.is_current(str(user_fixture.id), version - 1)
+    assert other_worker.is_current(str(user_fixture.id), version - 1)
+
+    await other_worker.handle_message(f'{user_fixture.id}:{version}')
+
+    assert not other_worker.is_current(str(user_fixture.id), version - 1)
+    assert other_worker.is_current(str(user_fixture.id), version)
+
+    # Messages missed while disconnected are recovered on resubscription.
+    version = await worker.bump(user_fixture.id)
+    await other_worker.handle_message(None)
+
+    assert not other_worker.is_current(str(user_fixture.id), version - 1)
+
+
+@pytest.mark.asyncio
+async def test_assign_role_bulk(superuser_authenticated_client, test_db_session, user_fixture, roles_fixture):
+    response = await superuser_authenticated_client.post(
+        "/role/assign/bulk",
+        json={"usernames": [user_fixture.username, "nonexistent"], "role_name": roles_fixture['testrole'].name}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert results == [
+        {"username": user_fixture.username, "status": "updated", "role": "testrole"},
+        {"username": "nonexistent", "status": "not_found"},
+        {"updated": 1, "not_found": 1},
+    ]
+
+    await test_db_session.refresh(user_fixture)
+    assert user_fixture.role.name == 'testrole'
+
+    response = await superuser_authenticated_client.post("/role/revoke/bulk", json={"with_role": "testrole"})
+
+    assert response.status_code == HTTPStatus.OK
+    assert json.loads(response.text.splitlines()[-1]) == {"updated": 1, "not_found": 0}
+    await test_db_session.refresh(user_fixture)
+    assert user_fixture.role.name == roles_fixture['user'].name
+
+
+@pytest.mark.parametrize("payload", [
+    {"role_name": "testrole"},
+    {"role_name": "testrole", "usernames": ["testuser"], "with_role": "user"},
+])
+@pytest.mark.asyncio
+async def test_assign_role_bulk_requires_single_target(superuser_authenticated_client, roles_fixture, payload):
+    response = await superuser_authenticated_client.post("/role/assign/bulk", json=payload)
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_claims_versions_bump_many(fake_redis, user_fixture, superuser_fixture):
+    worker, other_worker = ClaimsVersions(fake_redis, 60), ClaimsVersions(fake_redis, 60)
+    user_ids = [str(user_fixture.id), str(superuser_fixture.id)]
+
+    await worker.bump_many(user_ids)
+    await other_worker.handle_message(f'{user_ids[0]}:1,{user_ids[1]}:1')
+
+    for claims_versions in (worker, other_worker):
+        assert not any(claims_versions.is_current(user_id, 0) for user_id in user_ids)
+
+
+@pytest.mark.asyncio
+async def test_claims_versions_expire(fake_redis, user_fixture, superuser_fixture):
+    worker, other_worker = ClaimsVersions(fake_redis, 0.05), ClaimsVersions(fake_redis, 0.05)
+    user_id, superuser_id = str(user_fixture.id), str(superuser_fixture.id)
+
+    await worker.bump(user_id)
+    await asyncio.sleep(0.1)
+    version = await worker.bump(superuser_id)
+
+    # Tokens issued before the first bump have expired, its version is dropped from Redis and from the mirror.
+    assert await fake_redis.zscore(CLAIMS_VERSIONS_KEY, user_id) is None
+    assert await fake_redis.zscore(CLAIMS_VERSIONS_KEY, superuser_id) == version
+    assert worker.is_current(user_id, 0)
+    assert not worker.is_current(superuser_id, version - 1)
+
+    await other_worker.handle_message(None)
+
+    assert other_worker.is_current(user_id, 0)
+    assert not other_worker.is_current(superuser_id, version - 1)
+
+    # Tokens are issued with the current server time, after any bump.
+    issued = await worker.issue()
+    assert worker.is_current(user_id, issued)
+    assert worker.is_current(superuser_id, issued)
+    assert await worker.bump(user_id) > issued
+
+
+@pytest.mark.asyncio
+async def test_login_after_claims_version_expired(client_fixture, fake_redis, superuser_fixture, monkeypatch):
+    claims_versions = get_role_service(redis=fake_redis).claims_versions
+    monkeypatch.setattr(claims_versions, 'ttl', 0.05)
+    await claims_versions.bump(superuser_fixture.id)
+    # The version expires in Redis, the mirror keeps it.
+    await asyncio.sleep(0.1)
+
+    response = await client_fixture.post(
+        "/auth/login", json={"username": superuser_fixture.username, "password": "testpassword"}
+    )
+    client_fixture.cookies = response.cookies
+    response = await client_fixture.get("/role/")
+
+    assert response.status_code == HTTPStatus.OK
@@ -0,0 +1,60 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from src.core import tracing
+from src.core.config import TracingSettings
+from src.db.redis import instrument
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+
+
+@pytest.fixture
+def span_exporter(monkeypatch, test_db_session, fake_redis):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, 'tracer', provider.get_tracer(__name__))
+    tracing.instrument_engine(test_db_session.bind)
+    instrument(fake_redis)
+    yield exporter
+    provider.shutdown()
+    tracing.uninstrument_engine(test_db_session.bind)
+    # `instrument` wraps the method by an instance attribute, removing it restores the original.
+    del fake_redis.execute_command
+
+
+@pytest.mark.asyncio
+async def test_login_spans(client_fixture, user_fixture, span_exporter):
+    response = await client_fixture.post(
+        '/auth/login',
+        json={'username': user_fixture.username, 'password': 'testpassword'},
+        headers={'traceparent': f'00-{TRACE_ID}-00f067aa0ba902b7-01'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+    spans = {span.name: span for span in span_exporter.get_finished_spans()}
+
+    assert spans['POST /auth/login'].attributes['http.status_code'] == HTTPStatus.OK
+    assert {'UserService.verify', 'HistoryService.create', 'AuthenticationService.new_token_pair', 'SELECT', 'EVALSHA'} <= set(spans)
+    # Trace is continued from the caller, service spans are children of the request span.
+    assert {format(span.context.trace_id, '032x') for span in spans.values()} == {TRACE_ID}
+    assert spans['UserService.verify'].parent.span_id == spans['POST /auth/login'].context.span_id
+
+
+def test_file_exporter_is_closed_on_shutdown(tmp_path):
+    trace_file = tmp_path / 'traces.jsonl'
+    tracing.setup_tracing(TracingSettings(exporter='file', file_path=str(trace_file), sample_ratio=1))
+    with tracing.span('test'):
+        pass
+    exporter_file = tracing._trace_file
+
+    tracing.shutdown_tracing()
+
+    assert exporter_file.closed
+    assert json.loads(trace_file.read_text().splitlines()[0])['name'] == 'test'
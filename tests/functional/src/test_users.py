@@ -0,0 +1,111 @@
+from http import HTTPStatus
+
+import orjson
+import pytest
+from sqlalchemy import select
+
+from src.core.hashing import PasswordHasher
+from src.models import User
+from src.services.user_import import UserImporter, parse_rows
+
+
+@pytest.mark.asyncio
+async def test_import_users_reports_rows_per_line(superuser_authenticated_client, test_db_session, user_fixture):
+    rows = [
+        {'username': 'imported1', 'password': 'importpassword'},
+        {'username': user_fixture.username, 'password': 'importpassword'},
+        {'username': 'imported2', 'password': 'importpassword', 'role': 'testrole'},
+        {'username': 'imported1', 'password': 'importpassword'},
+        {'username': 'imported3', 'password': 'short'},
+        {'username': 'imported4', 'password': 'importpassword', 'role': 'unknown'},
+    ]
+    body = b'\n'.join(orjson.dumps(row) for row in rows) + b'\nnot json\n'
+
+    response = await superuser_authenticated_client.post('/users/import?batch_size=4', content=body)
+
+    assert response.status_code == HTTPStatus.OK
+    *results, summary = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [(result['line'], result['status']) for result in results] == [
+        (2, 'conflict'), (4, 'conflict'), (5, 'invalid'), (6, 'invalid'), (7, 'invalid'),
+    ]
+    assert summary == {'created': 2, 'conflicts': 2, 'invalid': 3}
+
+    users = {
+        user.username: user
+        for user in (await test_db_session.scalars(select(User).where(User.username.like('imported%')))).all()
+    }
+    assert set(users) == {'imported1', 'imported2'}
+    await test_db_session.refresh(users['imported2'], ['role'])
+    assert users['imported2'].role.name == 'testrole'
+    assert users['imported1'].is_correct_password('importpassword')
+
+
+@pytest.mark.asyncio
+async def test_import_users_reports_non_string_fields(superuser_authenticated_client, roles_fixture):
+    rows = [
+        {'username': 123, 'password': 'importpassword'},
+        {'username': 'imported1', 'password': 'importpassword', 'role': 1},
+        {'username': 'imported2', 'password': 'importpassword', 'role': ['user']},
+        {'username': 'imported3', 'password': 'importpassword'},
+    ]
+    body = b'\n'.join(orjson.dumps(row) for row in rows)
+
+    response = await superuser_authenticated_client.post('/users/import', content=body)
+
+    assert response.status_code == HTTPStatus.OK
+    *results, summary = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [(result['line'], result.get('username'), result['status']) for result in results] == [
+        (1, None, 'invalid'), (2, 'imported1', 'invalid'), (3, 'imported2', 'invalid'),
+    ]
+    assert summary == {'created': 1, 'conflicts': 0, 'invalid': 3}
+
+
+@pytest.mark.asyncio
+async def test_import_users_csv(superuser_authenticated_client, test_db_session, roles_fixture):
+    body = 'username,password,role\ncsvuser1,importpassword,\ncsvuser2,importpassword,testrole\n'
+
+    response = await superuser_authenticated_client.post(
+        '/users/import?report_created=true', content=body, headers={'Content-Type': 'text/csv'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    results = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [result.get('status') for result in results] == ['created', 'created', None]
+    assert results[-1] == {'created': 2, 'conflicts': 0, 'invalid': 0}
+
+
+@pytest.mark.asyncio
+async def test_import_users_rejects_non_utf8_body(superuser_authenticated_client):
+    body = '{"username": "importé", "password": "importpassword"}'.encode('latin-1')
+
+    response = await superuser_authenticated_client.post('/users/import', content=body)
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_import_users_requires_superuser(authenticated_client):
+    response = await authenticated_client.post('/users/import', content=b'{}')
+
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+@pytest.mark.asyncio
+async def test_import_users_bounds_hashing_concurrency(test_db_session, roles_fixture):
+    class RecordingHasher(PasswordHasher):
+        max_pending = 0
+
+        async def hash(self, password: str) -> str:
+            self.max_pending = max(self.max_pending, self.pending + 1)
+            return await super().hash(password)
+
+    hasher = RecordingHasher('thread', max_workers=4)
+    lines = [orjson.dumps({'username': f'imported{number}', 'password': 'importpassword'}).decode() for number in range(10)]
+    rows = parse_rows(lines, 'ndjson')
+    try:
+        results = [result async for result in UserImporter(test_db_session, hasher, hash_concurrency=2).run(rows)]
+    finally:
+        hasher.shutdown()
+
+    assert results[-1].created == 10
+    assert hasher.max_pending == 2